@@ -0,0 +1,103 @@
+from typing import List, Callable
+
+import numpy as np
+
+from Network import Network
+from formulas import sigmoid_neat
+
+
+class BatchNetwork:
+    def __init__(self, networks: List[Network], input_size: int, output_size: int, batch_size: int = None,
+                 activation: Callable = sigmoid_neat, min_group_size: int = 4):
+        """
+        The BatchNetwork evaluates many Networks at once
+        Networks with the same connections, which only differ in weights, are grouped by their structure key,
+        the weights of each group are stacked into one (group, in + middle, middle + out) tensor,
+        so every network of a group is evaluated with one matrix product for each level of hidden nodes
+        The weights of the networks left over are packed into one padded stacked tensor,
+        which is evaluated one hidden node at a time
+        :param networks: The networks to evaluate, one per agent in the batch
+        :param input_size: The number of input nodes of every network
+        :param output_size: The number of output nodes of every network
+        :param batch_size: The number of agents in the batch, slots without a network output zeros
+        :param activation: The activation function shared by all the networks
+        :param min_group_size: The smallest number of networks with the same structure which are stacked as a group
+        """
+        self.input_size: int = input_size
+        self.output_size: int = output_size
+        self.batch_size: int = batch_size if batch_size is not None else len(networks)
+        self.network_count: int = len(networks)
+        self.activation_function: Callable = activation
+
+        assert self.network_count <= self.batch_size
+        group_indices = {}
+        for i in range(self.network_count):
+            neural_net = networks[i].neural_net
+            assert neural_net.in_dem == self.input_size and neural_net.out_dem == self.output_size
+            if neural_net.effective_weights is not None:
+                group_indices.setdefault(neural_net.get_structure_key(), []).append(i)
+
+        self.groups: list = []
+        grouped = np.zeros(self.network_count, dtype=bool)
+        for indices in group_indices.values():
+            if len(indices) >= min_group_size:
+                self.groups.append(self.stack([networks[i] for i in indices], indices))
+                grouped[indices] = True
+
+        self.packed_indices: np.array = np.flatnonzero(~grouped)
+        self.middle_size: int = max([networks[i].neural_net.middle_dem for i in self.packed_indices], default=0)
+        self.weights: np.array = np.zeros((len(self.packed_indices),
+                                           self.input_size + self.middle_size,
+                                           self.middle_size + self.output_size))
+        for slot, i in enumerate(self.packed_indices):
+            self.pack(slot, networks[i])
+
+    def stack(self, networks: List[Network], indices: List[int]) -> tuple:
+        """
+        Stacks the weights of networks with the same structure, split into one block for the inputs
+        and one block for each level of hidden nodes, the levels are shared by every network of the group
+        :param networks: The networks of the group
+        :param indices: The slots of the networks in the batch
+        :return: A Tuple containing, the slots, the levels, and the stacked weight blocks in evaluation order
+        """
+        weights = np.stack([network.neural_net.effective_weights for network in networks])
+        levels = networks[0].neural_net.levels
+        blocks = [weights[:, :self.input_size]] + [weights[:, self.input_size + level] for level in levels]
+        return np.array(indices, dtype=np.int64), levels, blocks
+
+    def pack(self, slot: int, network: Network):
+        """
+        Copies the weights of a network into its slot of the padded tensor
+        Hidden nodes are padded up to the largest hidden layer, padded nodes have no connections
+        :param slot: The slot of the network in the padded tensor
+        :param network: The network to copy
+        """
+        neural_net = network.neural_net
+        middle_dem = neural_net.middle_dem
+        rows = np.concatenate([np.arange(self.input_size), self.input_size + np.arange(middle_dem)])
+        columns = np.concatenate([np.arange(middle_dem), self.middle_size + np.arange(self.output_size)])
+        self.weights[slot][np.ix_(rows, columns)] = neural_net.get_effective_weights()
+
+    def run(self, input_batch: np.array) -> np.array:
+        """
+        Runs every network in the batch on its own input
+        :param input_batch: A (batch, input) array with a row of input values for every agent
+        :return: A (batch, output) array with a row of output values for every agent
+        """
+        input_batch = np.asarray(input_batch, dtype=float)
+        assert input_batch.shape == (self.batch_size, self.input_size)
+        output_batch = np.zeros((self.batch_size, self.output_size))
+
+        for indices, levels, blocks in self.groups:
+            node_sum = np.matmul(input_batch[indices, np.newaxis], blocks[0])
+            for level, block in zip(levels, blocks[1:]):
+                node_sum += np.matmul(self.activation_function(node_sum[:, :, level]), block)
+            output_batch[indices] = self.activation_function(node_sum[:, 0, node_sum.shape[2] - self.output_size:])
+
+        if len(self.packed_indices) > 0:
+            node_sum = np.einsum('bi,bij->bj', input_batch[self.packed_indices], self.weights[:, :self.input_size])
+            for i in range(self.middle_size):
+                node_value = self.activation_function(node_sum[:, i:i + 1])
+                node_sum[:, i + 1:] += node_value * self.weights[:, self.input_size + i, i + 1:]
+            output_batch[self.packed_indices] = self.activation_function(node_sum[:, self.middle_size:])
+        return output_batch
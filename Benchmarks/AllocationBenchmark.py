@@ -0,0 +1,75 @@
+import random
+from time import perf_counter
+from typing import List, Tuple
+
+from functions import divide_whole
+
+
+def recursive_divide_whole(whole: int, fractions: List[float]) -> List[int]:
+    """
+    The recursive divide_whole used before the largest remainder version, kept to compare against
+    It recurses once for every chunk it hands out, finding the largest fraction with max and index each time
+    :param whole: The number to divide
+    :param fractions: The share of the whole for each part, changed in place
+    :return: The integer part for each fraction
+    """
+    top = max(fractions)
+    index = fractions.index(top)
+    if top >= 1.0:
+        chunk = int(top)
+        fractions[index] -= chunk
+    else:
+        chunk = 1
+        fractions[index] = 0
+    whole -= chunk
+    if whole > 0:
+        result = recursive_divide_whole(whole, fractions)
+    else:
+        result = [0 for fraction in fractions]
+    result[index] += chunk
+    return result
+
+
+def species_fractions(population_size: int, species_count: int) -> List[float]:
+    """
+    Creates the share of the next population for each species, as Population.next does from niche fitnesses
+    :param population_size: The size of the population
+    :param species_count: The number of species
+    :return: The share of each species, summing to the population size
+    """
+    niche_fitnesses = [random.random() for i in range(species_count)]
+    total_fitness = sum(niche_fitnesses)
+    return [niche_fitness * population_size / total_fitness for niche_fitness in niche_fitnesses]
+
+
+def benchmark(sizes: Tuple[Tuple[int, int], ...] = ((1000, 100), (1000, 500), (10000, 200), (10000, 1000),
+                                                      (50000, 500), (100000, 2000)), repeats: int = 20):
+    """
+    Divides populations between more and more species, printing the average time for each allocation in milliseconds
+    The recursive version is timed on the same fractions, it fails when it runs out of stack
+    :param sizes: The (population size, species count) pairs to time
+    :param repeats: The number of allocations timed for each pair
+    """
+    print("%8s %8s | %12s %12s" % ("size", "species", "iterative", "recursive"))
+    for population_size, species_count in sizes:
+        fractions = [species_fractions(population_size, species_count) for i in range(repeats)]
+
+        start = perf_counter()
+        counts = [divide_whole(population_size, list(fraction)) for fraction in fractions]
+        iterative_time = (perf_counter() - start) / repeats * 1e3
+        assert all(sum(count) == population_size for count in counts)
+
+        try:
+            start = perf_counter()
+            recursive_counts = [recursive_divide_whole(population_size, list(fraction)) for fraction in fractions]
+            recursive_time = "%12.3f" % ((perf_counter() - start) / repeats * 1e3)
+            assert recursive_counts == counts
+        except RecursionError:
+            recursive_time = "%12s" % "RecursionError"
+
+        print("%8d %8d | %12.3f %s" % (population_size, species_count, iterative_time, recursive_time))
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    benchmark()
@@ -0,0 +1,163 @@
+import random
+from time import perf_counter
+from typing import List, Tuple
+
+import numpy
+
+from Conditions import Conditions
+from Evaluator import Evaluator
+from Genome import Genome
+from NeatApplication import NeatApplication
+from ProcessEvaluator import ProcessEvaluator
+from Simulations.DodgingSimulation import DodgingSimulation
+from WorkerPool import WorkerPool
+
+
+def dodging_conditions(population_size: int, random_seed: int = None) -> Conditions:
+    """
+    Creates the conditions of main for a dodging run
+    :param population_size: The number of genomes
+    :param random_seed: The seed of the random generator of the conditions
+    :return: The conditions
+    """
+    return Conditions(gene_weight_probability=0.8, gene_random_probability=0.1,
+                      genome_disable_probability=0.75, genome_node_probability=0.03,
+                      genome_connection_probability=0.05, species_asexual_probability=0.25,
+                      species_interspecies_reproduction_probability=0.001, species_keep_ratio=.5,
+                      gene_max_weight=1.0, gene_min_weight=-1.0, gene_weight_shift=.01,
+                      genome_weight_coefficient=0.4, genome_disjoint_coefficient=1.0,
+                      genome_excess_coefficient=1.0, genome_min_divide=20, species_age_fertility_limit=15,
+                      species_threshold=3.0, species_keep_champion=True, species_champion_limit=5,
+                      species_niche_divide_min=0, population_age_limit=20, population_size=population_size,
+                      app_start_node_depth=0, app_end_node_depth=100, random_seed=random_seed)
+
+
+def dodging_genomes(simulation: DodgingSimulation, population_size: int) -> List[Genome]:
+    """
+    Creates the first population NeatApplication would start a dodging run with, under the conditions of main,
+    with their networks already built
+    :param simulation: The dodging simulation
+    :param population_size: The number of genomes
+    :return: The genomes, which all share one gene pool
+    """
+    app = NeatApplication(dodging_conditions(population_size), simulation)
+    genomes = app.current_generation.population.get_genomes()
+    for genome in genomes:
+        genome.network
+    return genomes
+
+
+def seeded_run(evaluator: Evaluator, simulation: DodgingSimulation, population_size: int,
+               generations: int) -> List[List[float]]:
+    """
+    Runs a seeded dodging run, one genome at a time
+    :param evaluator: The evaluator to run the genomes on, None to run them in this process
+    :param simulation: The dodging simulation
+    :param population_size: The number of genomes
+    :param generations: The number of generations
+    :return: The fitnesses of every generation
+    """
+    random.seed(0)
+    app = NeatApplication(dodging_conditions(population_size, random_seed=0), simulation, evaluator=evaluator)
+    fitnesses = []
+    for i in range(generations):
+        generation = app.current_generation
+        app.run()
+        fitnesses.append(generation.population.get_fitnesses().tolist())
+    return fitnesses
+
+
+def check_evaluators(workers: int = 2, population_size: int = 100, generations: int = 5, width: int = 9,
+                     depth: int = 5, obstacles: int = 2):
+    """
+    Checks that seeded runs give the same fitnesses on every generation,
+    whether the genomes are run in this process or on worker processes
+    :param workers: The number of worker processes
+    :param population_size: The number of genomes
+    :param generations: The number of generations
+    :param width: The width of the simulation
+    :param depth: The depth of the simulation
+    :param obstacles: The number of obstacles in each row
+    """
+    simulation = DodgingSimulation(width, depth, batch_size=population_size, obstacles=obstacles)
+    serial = seeded_run(None, simulation, population_size, generations)
+    evaluators = {"genes": ProcessEvaluator(simulation, workers),
+                  "arena": ProcessEvaluator(simulation, workers, shared_memory_arena=True),
+                  "pool": WorkerPool(simulation, simulation.get_data_size(), simulation.get_controls_size(), workers)}
+    try:
+        for name, evaluator in evaluators.items():
+            assert seeded_run(evaluator, simulation, population_size, generations) == serial, name
+    finally:
+        for evaluator in evaluators.values():
+            evaluator.close()
+    print("%d generations of %d genomes gave the serial fitnesses on %s" % (
+        generations, population_size, ", ".join(evaluators)))
+
+
+def time_evaluator(evaluator: Evaluator, simulation: DodgingSimulation, genomes: List[Genome],
+                   repeats: int) -> Tuple[float, List[float]]:
+    """
+    Times an evaluator on the dodging simulation
+    :param evaluator: The evaluator to time, None to run the genomes one at a time in this process,
+        restarting the simulation before each genome as Population.run does
+    :param simulation: The simulation to run the genomes on when there is no evaluator
+    :param genomes: The genomes to run
+    :param repeats: The number of times the genomes are run
+    :return: A Tuple containing, the genomes run per second, and the fitnesses of the last run
+    """
+    batch_ids = list(range(len(genomes)))
+    start = perf_counter()
+    for i in range(repeats):
+        if evaluator is None:
+            fitnesses = []
+            for genome, batch_id in zip(genomes, batch_ids):
+                simulation.restart()
+                genome.run(simulation, batch_id=batch_id)
+                fitnesses.append(genome.raw_fitness)
+        else:
+            fitnesses = evaluator.evaluate(genomes, batch_ids)
+    return len(genomes) * repeats / (perf_counter() - start), fitnesses
+
+
+def benchmark(worker_counts: Tuple[int, ...] = (1, 2, 4, 8), population_size: int = 500, width: int = 9,
+              depth: int = 5, obstacles: int = 2, repeats: int = 3):
+    """
+    Runs a population on the dodging simulation one genome at a time, serially and on worker processes,
+    printing the genomes run per second and the speed up over the serial run
+    Each genome meets the obstacles seeded by its batch id, so every backend must give the serial fitnesses
+    The pools are started before they are timed, so their start up time is not counted
+    :param worker_counts: The numbers of worker processes
+    :param population_size: The number of genomes
+    :param width: The width of the simulation
+    :param depth: The depth of the simulation
+    :param obstacles: The number of obstacles in each row
+    :param repeats: The number of times the population is run
+    """
+    simulation = DodgingSimulation(width, depth, batch_size=population_size, obstacles=obstacles)
+    genomes = dodging_genomes(simulation, population_size)
+    serial_rate, serial_fitnesses = time_evaluator(None, simulation, genomes, repeats)
+    serial_steps = float(numpy.mean(serial_fitnesses))
+    print("%8s %8s | %12s %8s %8s" % ("backend", "workers", "genomes/s", "speed up", "steps"))
+    print("%8s %8d | %12.0f %8.2f %8.2f" % ("serial", 1, serial_rate, 1.0, serial_steps))
+    for workers in worker_counts:
+        evaluators = {"genes": ProcessEvaluator(simulation, workers),
+                      "arena": ProcessEvaluator(simulation, workers, shared_memory_arena=True),
+                      "pool": WorkerPool(simulation, simulation.get_data_size(), simulation.get_controls_size(),
+                                         workers)}
+        try:
+            for name, evaluator in evaluators.items():
+                evaluator.evaluate(genomes[:workers], list(range(workers)))
+                rate, fitnesses = time_evaluator(evaluator, simulation, genomes, repeats)
+                assert list(fitnesses) == list(serial_fitnesses)
+                print("%8s %8d | %12.0f %8.2f %8.2f" % (name, workers, rate, rate / serial_rate,
+                                                        float(numpy.mean(fitnesses))))
+        finally:
+            for evaluator in evaluators.values():
+                evaluator.close()
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    numpy.random.seed(0)
+    check_evaluators()
+    benchmark()
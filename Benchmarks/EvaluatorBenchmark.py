@@ -0,0 +1,181 @@
+import random
+from time import perf_counter
+from typing import List, Tuple
+
+import numpy
+
+from Benchmarks.PhenotypeBenchmark import random_genes
+from Evaluator import Evaluator
+from ForkEvaluator import ForkEvaluator
+from Genome import Genome
+from PhenotypeArena import PhenotypeArena
+from ProcessEvaluator import ProcessEvaluator
+from Simulations.XorSimulation import XorSimulation
+from ThreadEvaluator import ThreadEvaluator
+from WorkerPool import WorkerPool
+
+
+def random_genomes(count: int, middle_size: int, density: float) -> List[Genome]:
+    """
+    Creates random genomes for the xor simulation, with their networks already built
+    The genomes share one random structure and one gene pool, as the genomes of a run share their gene pool,
+    each genome has its own random weights
+    :param count: The number of genomes
+    :param middle_size: The number of middle nodes of each genome
+    :param density: The fraction of the weight matrix which is connected
+    :return: The genomes
+    """
+    genes, gene_pool = random_genes(3, 1, middle_size, density)
+    genomes = []
+    for i in range(count):
+        for gene in genes:
+            gene.weight = random.uniform(-1.0, 1.0)
+        genome = Genome(genes, 3, 1, gene_pool)
+        genome.network
+        genomes.append(genome)
+    return genomes
+
+
+def product_fraction(genomes: List[Genome], repeats: int) -> float:
+    """
+    Measures the fraction of the time spent running the networks on the xor dataset
+    which is spent in the matrix products, where NumPy lets go of the GIL
+    :param genomes: The genomes, with dense networks
+    :param repeats: The number of times each network is timed
+    :return: The fraction of the time spent in matrix products
+    """
+    dataset = XorSimulation().get_dataset()
+    start = perf_counter()
+    for i in range(repeats):
+        for genome in genomes:
+            genome.network.run_batch(dataset)
+    total_time = perf_counter() - start
+
+    stages = [[(numpy.random.random((len(dataset), block.shape[0])), block)
+               for block in genome.network.neural_net.stage_weights] for genome in genomes]
+    start = perf_counter()
+    for i in range(repeats):
+        for genome_stages in stages:
+            for values, block in genome_stages:
+                numpy.dot(values, block)
+    return min(1.0, (perf_counter() - start) / total_time)
+
+
+def time_evaluator(evaluator: Evaluator, genomes: List[Genome], repeats: int) -> Tuple[float, List[float]]:
+    """
+    Times an evaluator on a population
+    :param evaluator: The evaluator to time, None to run the genomes one at a time in this thread
+    :param genomes: The genomes to run
+    :param repeats: The number of times the population is run
+    :return: A Tuple containing, the average time of a run in milliseconds, and the fitnesses
+    """
+    simulation = XorSimulation()
+    batch_ids = list(range(len(genomes)))
+    start = perf_counter()
+    for i in range(repeats):
+        if evaluator is None:
+            fitnesses = []
+            for genome in genomes:
+                simulation.restart()
+                genome.run(simulation)
+                fitnesses.append(genome.raw_fitness)
+        else:
+            fitnesses = evaluator.evaluate(genomes, batch_ids)
+    return (perf_counter() - start) / repeats * 1e3, fitnesses
+
+
+def benchmark(workers: int = 4, middle_sizes: Tuple[int, ...] = (4, 64, 256, 512),
+              population_sizes: Tuple[int, ...] = (32, 256), density: float = 0.2, repeats: int = 3):
+    """
+    Runs populations of random genomes serially, on threads, on processes and on forked processes,
+    printing the average time for each population in milliseconds
+    Threads only beat the serial run once the networks are large enough for the matrix products,
+    which let go of the GIL, to outweigh the Python around them
+    Processes pay for packing the networks into an arena and for their messages on every run,
+    which only pays off for large populations
+    Forked processes send nothing, but pay for forking and build the networks again on every run
+    The pools are started once and reused, so their start up time is not counted
+    The times are measured on the cores the benchmark runs on, the last columns estimate the times with one core
+    for each worker, threads share out only the matrix products and add their overhead,
+    processes share out everything but packing the arena
+    :param workers: The number of threads and processes
+    :param middle_sizes: The number of middle nodes of the genomes
+    :param population_sizes: The number of genomes in a population
+    :param density: The fraction of the weight matrix which is connected
+    :param repeats: The number of times each population is run
+    """
+    simulation = XorSimulation()
+    evaluators = {"threads": ThreadEvaluator(simulation, workers),
+                  "processes": ProcessEvaluator(simulation, workers, shared_memory_arena=True),
+                  "fork": ForkEvaluator(simulation, workers)}
+    print("%6s %10s | %10s %10s %10s %10s | %s | %8s %10s %10s | %s" % (
+        "middle", "population", "serial", "threads", "processes", "fork", "fastest", "products", "est thread",
+        "est proc", "est fastest"))
+    try:
+        for middle_size in middle_sizes:
+            for population_size in population_sizes:
+                genomes = random_genomes(population_size, middle_size, density)
+                times = {}
+                times["serial"], serial_fitnesses = time_evaluator(None, genomes, repeats)
+                for name, evaluator in evaluators.items():
+                    times[name], fitnesses = time_evaluator(evaluator, genomes, repeats)
+                    assert numpy.allclose(fitnesses, serial_fitnesses, rtol=0, atol=1e-12)
+
+                products = product_fraction(genomes, repeats)
+                start = perf_counter()
+                for i in range(repeats):
+                    PhenotypeArena([genome.network for genome in genomes], 3, 1).close()
+                pack_time = (perf_counter() - start) / repeats * 1e3
+                estimates = {"serial": times["serial"],
+                             "threads": times["serial"] * ((1 - products) + products / workers) +
+                                        max(0.0, times["threads"] - times["serial"]),
+                             "processes": pack_time + (times["processes"] - pack_time) / workers}
+                print("%6d %10d | %10.1f %10.1f %10.1f %10.1f | %9s | %8.2f %10.1f %10.1f | %s" % (
+                    (middle_size, population_size) + tuple(times.values()) + (min(times, key=times.get), products,
+                     estimates["threads"], estimates["processes"], min(estimates, key=estimates.get))))
+    finally:
+        for evaluator in evaluators.values():
+            evaluator.close()
+
+
+def startup_benchmark(worker_counts: Tuple[int, ...] = (1, 2, 4, 8), generations: int = 20):
+    """
+    Times the cost of a generation which is not spent running genomes, for a new genome on each worker,
+    printing the average time of a generation in milliseconds
+    The ForkEvaluator forks its workers on every generation, the WorkerPool and ProcessEvaluator start theirs once,
+    the time to start them is printed apart
+    :param worker_counts: The number of workers
+    :param generations: The number of generations timed
+    """
+    simulation = XorSimulation()
+    print("%7s | %10s %10s | %10s %10s %10s" % ("workers", "pool start", "exec start", "fork", "pool", "processes"))
+    for workers in worker_counts:
+        start = perf_counter()
+        pool = WorkerPool(simulation, 3, 1, workers)
+        pool_start = (perf_counter() - start) * 1e3
+        start = perf_counter()
+        processes = ProcessEvaluator(simulation, workers, chunks_per_worker=1)
+        processes.evaluate(random_genomes(workers, 1, 0.5), list(range(workers)))
+        processes_start = (perf_counter() - start) * 1e3
+        fork = ForkEvaluator(simulation, workers)
+        times = []
+        try:
+            for evaluator in [fork, pool, processes]:
+                elapsed = 0
+                for i in range(generations):
+                    genomes = random_genomes(workers, 1, 0.5)
+                    start = perf_counter()
+                    evaluator.evaluate(genomes, list(range(workers)))
+                    elapsed += perf_counter() - start
+                times.append(elapsed / generations * 1e3)
+        finally:
+            pool.close()
+            processes.close()
+        print("%7d | %10.1f %10.1f | %10.2f %10.2f %10.2f" % ((workers, pool_start, processes_start) + tuple(times)))
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    numpy.random.seed(0)
+    startup_benchmark()
+    benchmark()
@@ -0,0 +1,93 @@
+import random
+from time import perf_counter
+from typing import List, Tuple
+
+from GenePool import GenePool
+from StructureGene import StructureGene
+
+
+class DigitHashStructureGene(StructureGene):
+    def __hash__(self):
+        """
+        The digit by digit hash StructureGene used before the registry was keyed by tuples, kept to compare against
+        The hash is computed in Python on every lookup, and connections into output nodes collide often
+        :return: a hash built from the digits of the nodes
+        """
+        hash_agg = 0
+        shift = 1
+        in_node = self.in_node
+        out_node = self.out_node
+        while in_node > 0 or out_node > 0:
+            hash_agg += shift * (in_node % 10) + shift * 10 * (out_node % 10)
+            in_node = in_node // 10
+            out_node = out_node // 10
+            shift *= 100
+        return hash_agg
+
+
+def random_connections(count: int, output_size: int, output_ratio: float) -> List[Tuple[int, int]]:
+    """
+    Creates distinct random connections, some of which end at output nodes
+    :param count: The number of connections
+    :param output_size: The number of output nodes
+    :param output_ratio: The fraction of the connections which end at an output node
+    :return: A list of (in_node, out_node) connections
+    """
+    connections = set()
+    while len(connections) < count:
+        in_node = random.randint(1, count)
+        if random.random() < output_ratio:
+            connections.add((in_node, random.randint(-output_size + 1, 0)))
+        else:
+            connections.add((in_node, random.randint(1, count)))
+    return list(connections)
+
+
+def benchmark(sizes: Tuple[int, ...] = (1000, 4000, 16000, 64000, 256000), lookups: int = 20000,
+              output_size: int = 4, output_ratio: float = 0.2):
+    """
+    Fills innovation registries with more and more connections,
+    printing the average time to look up a known connection and to register a new one in microseconds
+    The same connections are also timed in a dictionary keyed by digit hash Structure Genes, the old registry
+    :param sizes: The numbers of connections to fill the registries with
+    :param lookups: The number of lookups timed for each size
+    :param output_size: The number of output nodes
+    :param output_ratio: The fraction of the connections which end at an output node
+    """
+    print("%8s | %12s %12s | %12s %12s" % ("size", "lookup", "register", "old lookup", "old register"))
+    for size in sizes:
+        connections = random_connections(size + lookups, output_size, output_ratio)
+        known, new = connections[:size], connections[size:]
+        queries = [random.choice(known) for i in range(lookups)]
+
+        gene_pool = GenePool(0, 0, {})
+        for in_node, out_node in known:
+            gene_pool.get_connection_innovation(in_node, out_node)
+        start = perf_counter()
+        for in_node, out_node in queries:
+            gene_pool.get_connection_innovation(in_node, out_node)
+        lookup_time = (perf_counter() - start) / lookups * 1e6
+        start = perf_counter()
+        for in_node, out_node in new:
+            gene_pool.get_connection_innovation(in_node, out_node)
+        register_time = (perf_counter() - start) / lookups * 1e6
+
+        registry = {}
+        for in_node, out_node in known:
+            registry[DigitHashStructureGene(in_node, out_node)] = len(registry)
+        start = perf_counter()
+        for in_node, out_node in queries:
+            registry.get(DigitHashStructureGene(in_node, out_node))
+        digit_lookup_time = (perf_counter() - start) / lookups * 1e6
+        start = perf_counter()
+        for in_node, out_node in new:
+            registry[DigitHashStructureGene(in_node, out_node)] = len(registry)
+        digit_register_time = (perf_counter() - start) / lookups * 1e6
+
+        print("%8d | %12.2f %12.2f | %12.2f %12.2f" % (size, lookup_time, register_time,
+                                                        digit_lookup_time, digit_register_time))
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    benchmark()
@@ -0,0 +1,105 @@
+import random
+from time import perf_counter
+from typing import List, Tuple
+
+import numpy
+
+from Gene import Gene
+from GenePool import GenePool
+from NeatLinearNet import NeatLinearNet
+from processing_genes import process_genes, process_genes_sparse
+
+
+def random_genes(input_size: int, output_size: int, middle_size: int, density: float) -> Tuple[List[Gene], GenePool]:
+    """
+    Creates random genes for a network with a given number of middle nodes and fraction of connections
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param middle_size: The number of middle nodes
+    :param density: The fraction of the weight matrix which is connected
+    :return: A Tuple containing, the genes and a GenePool with the depths of their nodes
+    """
+    gene_pool = GenePool(0, input_size + middle_size + 1, {})
+    for node in range(1, input_size + 1):
+        gene_pool.set_depth(node, 0)
+    for node in range(0, -output_size, -1):
+        gene_pool.set_depth(node, 100000)
+    for node in range(input_size + 1, input_size + middle_size + 1):
+        gene_pool.set_depth(node, random.randint(1, 99999))
+
+    starts = list(range(1, input_size + middle_size + 1))
+    ends = list(range(input_size + 1, input_size + middle_size + 1)) + list(range(0, -output_size, -1))
+    connections = set()
+    # Every middle node gets a connection in and out, so every node shows up in the genes
+    for node in range(input_size + 1, input_size + middle_size + 1):
+        connections.add((random.randint(1, input_size), node))
+        connections.add((node, random.randint(-output_size + 1, 0)))
+    target = max(len(connections), int(density * (input_size + middle_size) * (middle_size + output_size)))
+    while len(connections) < target:
+        start = random.choice(starts)
+        end = random.choice(ends)
+        if gene_pool.get_depth(start) < gene_pool.get_depth(end):
+            connections.add((start, end))
+
+    genes = [Gene(random.uniform(-1.0, 1.0), start, end, innovation)
+             for innovation, (start, end) in enumerate(sorted(connections))]
+    return genes, gene_pool
+
+
+def time_call(function, repeats: int) -> float:
+    """
+    Times a function
+    :param function: The function to call, with no arguments
+    :param repeats: The number of times to call it
+    :return: The average time of a call in microseconds
+    """
+    start = perf_counter()
+    for i in range(repeats):
+        function()
+    return (perf_counter() - start) / repeats * 1e6
+
+
+def benchmark(input_size: int = 10, output_size: int = 4, samples: int = 64, repeats: int = 50):
+    """
+    Compares the dense and sparse phenotypes on random networks,
+    printing the build time, the single sample time and the batch time of each in microseconds
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param samples: The number of samples in a batch
+    :param repeats: The number of times each evaluation is timed
+    """
+    print("%6s %8s | %10s %10s | %10s %10s | %10s %10s | %s" % (
+        "middle", "density", "build d", "build s", "get_out d", "get_out s", "batch d", "batch s",
+        "faster build, get_out, batch"))
+    for middle_size in [16, 64, 256, 1024]:
+        for density in [0.005, 0.02, 0.05, 0.2]:
+            genes, gene_pool = random_genes(input_size, output_size, middle_size, density)
+            inputs = tuple(numpy.random.random(input_size))
+            input_batch = numpy.random.random((samples, input_size))
+
+            def build_dense():
+                weight_matrix, enabled_matrix, size, middles = process_genes(genes, input_size, output_size, gene_pool)
+                return NeatLinearNet(input_size, output_size, size, weights=weight_matrix,
+                                     enabled_weights=enabled_matrix, sparse_fill_ratio=0.0)
+
+            def build_sparse():
+                sparse_weights, size, middles = process_genes_sparse(genes, input_size, output_size, gene_pool)
+                return NeatLinearNet(input_size, output_size, size, sparse_weights=sparse_weights)
+
+            dense, sparse = build_dense(), build_sparse()
+            assert numpy.allclose(dense.run_batch(input_batch), sparse.run_batch(input_batch))
+            build_repeats = max(1, repeats // 10)
+            times = [time_call(build_dense, build_repeats), time_call(build_sparse, build_repeats),
+                     time_call(lambda: (dense.set_in(inputs), dense.get_out()), repeats),
+                     time_call(lambda: (sparse.set_in(inputs), sparse.get_out()), repeats),
+                     time_call(lambda: dense.run_batch(input_batch), repeats),
+                     time_call(lambda: sparse.run_batch(input_batch), repeats)]
+            faster = ["sparse" if times[i + 1] < times[i] else "dense" for i in range(0, 6, 2)]
+            print("%6d %8.3f | %10.0f %10.0f | %10.0f %10.0f | %10.0f %10.0f | %s" % (
+                (middle_size, density) + tuple(times) + (" ".join(faster),)))
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    numpy.random.seed(0)
+    benchmark()
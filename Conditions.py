@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Conditions:
     def __init__(self, gene_weight_probability: float, gene_random_probability: float,
                  genome_disable_probability: float, genome_node_probability: float,
@@ -15,7 +18,13 @@ class Conditions:
 
                  population_age_limit: int, population_size: int,
 
-                 app_start_node_depth: int, app_end_node_depth: int):
+                 app_start_node_depth: int, app_end_node_depth: int,
+
+                 random_seed: int = None,
+
+                 innovation_persistent: bool = False, innovation_registry_limit: int = None,
+
+                 fitness_cache_size: int = 4096):
         self.species_keep_ratio: float = species_keep_ratio
         self.gene_weight_probability: float = gene_weight_probability
         self.gene_random_probability: float = gene_random_probability
@@ -48,3 +57,13 @@ class Conditions:
         self.app_end_node_depth = app_end_node_depth
         self.new_node_count = 0
         self.new_connection_count = 0
+
+        # The bulk random draws of breeding and mutation come from one generator, so seeding it repeats them
+        self.random_generator: np.random.Generator = np.random.default_rng(random_seed)
+
+        # A persistent innovation registry gives a structure the same innovation number for the whole run
+        self.innovation_persistent: bool = innovation_persistent
+        self.innovation_registry_limit: int = innovation_registry_limit
+
+        # Fitnesses on deterministic simulations are remembered, a size of zero turns the cache off
+        self.fitness_cache_size: int = fitness_cache_size
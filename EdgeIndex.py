@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import bisect
+import copy
+import random
+from typing import Dict, List, Tuple, Optional
+
+import numpy as np
+
+from GeneArrays import GeneArrays
+from GenePool import GenePool
+
+
+class EdgeIndex:
+    def __init__(self, gene_arrays: GeneArrays, start_nodes: List[int], end_nodes: List[int], gene_pool: GenePool):
+        """
+        The EdgeIndex class keeps track of the connections which could still be added to a genome
+        A connection can go from any start node to any end node deeper than it, if the genome does not have it yet
+        End nodes are sorted by depth, so the possible ends of a start node are the ends after its depth
+        The set of connections the genome has is shared by copies of the index, each copy keeps the connections
+        it added and removed apart, so a child genome can take the index of its parent without copying the set
+        :param gene_arrays: The genes of the genome
+        :param start_nodes: The nodes a new connection can start at
+        :param end_nodes: The nodes a new connection can end at
+        :param gene_pool: The GenePool which has data on the depth of nodes
+        """
+        end_depths = gene_pool.node_table.get_depths(end_nodes)
+        order = np.argsort(end_depths, kind='stable')
+        self.end_nodes: List[int] = np.asarray(end_nodes, dtype=np.int64)[order].tolist()
+        end_depths = end_depths[order]
+
+        self.start_nodes: List[int] = list(start_nodes)
+        start_depths = gene_pool.node_table.get_depths(self.start_nodes)
+        self.first_ends: List[int] = end_depths.searchsorted(start_depths, 'right').tolist()
+
+        self.used: set = set(zip(gene_arrays.in_nodes.tolist(), gene_arrays.out_nodes.tolist()))
+        self.added: set = set()
+        self.removed: set = set()
+        self.start_indices: Dict[int, int] = {node: i for i, node in enumerate(self.start_nodes)}
+        self.end_indices: Dict[int, int] = {node: i for i, node in enumerate(self.end_nodes)}
+        used_forward = np.zeros(len(self.start_nodes), dtype=np.int64)
+        for in_node, out_node in self.used:
+            start_index = self.forward_start(in_node, out_node)
+            if start_index is not None:
+                used_forward[start_index] += 1
+
+        self.free: List[int] = (len(self.end_nodes) - np.array(self.first_ends, dtype=np.int64) - used_forward).tolist()
+        self.open_starts: List[int] = [i for i in range(len(self.start_nodes)) if self.free[i] > 0]
+
+    def forward_start(self, in_node: int, out_node: int) -> Optional[int]:
+        """
+        Finds the start node a connection is counted against, if it is one the index could have added
+        :param in_node: The node the connection starts at
+        :param out_node: The node the connection ends at
+        :return: The index of the start node, or None if the connection does not go forward between indexed nodes
+        """
+        start_index = self.start_indices.get(in_node)
+        end_index = self.end_indices.get(out_node)
+        if start_index is None or end_index is None or end_index < self.first_ends[start_index]:
+            return None
+        return start_index
+
+    def has(self, in_node: int, out_node: int) -> bool:
+        """
+        Checks if a connection is in the genome
+        :param in_node: The node the connection starts at
+        :param out_node: The node the connection ends at
+        :return: True if the genome has the connection, False otherwise
+        """
+        connection = (in_node, out_node)
+        return connection in self.added or (connection in self.used and connection not in self.removed)
+
+    def copy(self) -> EdgeIndex:
+        """
+        Copies the index, the set of connections and the parts which only depend on the nodes are shared,
+        only the connections added and removed since the set was made are copied
+        Once those pass a quarter of the set, the set is made again with them, so they stay small
+        :return: A copy of the index which can be changed without changing this index
+        """
+        index = copy.copy(self)
+        if (len(self.added) + len(self.removed)) * 4 > len(self.used):
+            index.used = (self.used - self.removed) | self.added
+            index.added = set()
+            index.removed = set()
+        else:
+            index.added = set(self.added)
+            index.removed = set(self.removed)
+        index.free = list(self.free)
+        index.open_starts = list(self.open_starts)
+        return index
+
+    def add(self, in_node: int, out_node: int):
+        """
+        Marks a connection as being in the genome, the shared set of connections is not changed
+        :param in_node: The node the connection starts at
+        :param out_node: The node the connection ends at
+        """
+        if self.has(in_node, out_node):
+            return
+        if (in_node, out_node) in self.removed:
+            self.removed.remove((in_node, out_node))
+        else:
+            self.added.add((in_node, out_node))
+        start_index = self.forward_start(in_node, out_node)
+        if start_index is not None:
+            self.free[start_index] -= 1
+            if self.free[start_index] == 0:
+                self.open_starts.remove(start_index)
+
+    def remove(self, in_node: int, out_node: int):
+        """
+        Marks a connection as no longer being in the genome, the shared set of connections is not changed
+        :param in_node: The node the connection starts at
+        :param out_node: The node the connection ends at
+        """
+        if not self.has(in_node, out_node):
+            return
+        if (in_node, out_node) in self.added:
+            self.added.remove((in_node, out_node))
+        else:
+            self.removed.add((in_node, out_node))
+        start_index = self.forward_start(in_node, out_node)
+        if start_index is not None:
+            self.free[start_index] += 1
+            if self.free[start_index] == 1:
+                # Kept in order, so the index is the same as one built from the genes
+                bisect.insort(self.open_starts, start_index)
+
+    def derive(self, gene_arrays: GeneArrays, child_arrays: GeneArrays) -> EdgeIndex:
+        """
+        Creates the index of a child genome with the same nodes, from the genes the child does not share
+        Only the differing genes are looked at, and this index is left as it is for the other children
+        :param gene_arrays: The genes of the genome of this index
+        :param child_arrays: The genes of the child genome
+        :return: The edge index of the child genome
+        """
+        index = self.copy()
+        removed = ~np.isin(gene_arrays.innovation_numbers, child_arrays.innovation_numbers, assume_unique=True)
+        for in_node, out_node in zip(gene_arrays.in_nodes[removed].tolist(), gene_arrays.out_nodes[removed].tolist()):
+            # Connections found again in a later generation can be carried by two genes
+            if not np.any(np.logical_and(child_arrays.in_nodes == in_node, child_arrays.out_nodes == out_node)):
+                index.remove(in_node, out_node)
+        added = ~np.isin(child_arrays.innovation_numbers, gene_arrays.innovation_numbers, assume_unique=True)
+        for in_node, out_node in zip(child_arrays.in_nodes[added].tolist(), child_arrays.out_nodes[added].tolist()):
+            index.add(in_node, out_node)
+        return index
+
+    def full(self) -> bool:
+        """
+        Checks if every possible connection is already in the genome
+        :return: True if no connection can be added, False otherwise
+        """
+        return len(self.open_starts) == 0
+
+    def sample(self, rejection_ratio: int = 4) -> Optional[Tuple[int, int]]:
+        """
+        Picks a random connection which is not in the genome
+        The start is picked from the start nodes which still have a free end, then the end from its free ends
+        Ends are drawn until a free one is found, which takes a constant number of draws on average
+        If less than one in rejection_ratio of the ends of the start is free, the free ends are listed instead
+        :param rejection_ratio: The ratio of possible to free ends up to which ends are drawn
+        :return: A Tuple containing, the start and end node of the connection, or None if the genome is full
+        """
+        if self.full():
+            return None
+        start_index = random.choice(self.open_starts)
+        start_node = self.start_nodes[start_index]
+        first_end = self.first_ends[start_index]
+        possible = len(self.end_nodes) - first_end
+
+        if self.free[start_index] * rejection_ratio >= possible:
+            while True:
+                end_node = self.end_nodes[first_end + random.randrange(possible)]
+                if not self.has(start_node, end_node):
+                    return start_node, end_node
+        else:
+            return start_node, random.choice([end_node for end_node in self.end_nodes[first_end:]
+                                              if not self.has(start_node, end_node)])
@@ -0,0 +1,27 @@
+from abc import abstractmethod
+from typing import List
+
+from Genome import Genome
+
+
+class Evaluator:
+    """
+    An Evaluator runs the simulation for the genomes of the non batched path of Population.run
+    Each genome is run as Genome.run would run it, with its batch id, and only its fitness is returned
+    """
+
+    @abstractmethod
+    def evaluate(self, genomes: List[Genome], batch_ids: List[int]) -> List[float]:
+        """
+        Runs the simulation for every genome
+        :param genomes: The genomes to run
+        :param batch_ids: The batch id of each genome
+        :return: The fitness of each genome
+        """
+        pass
+
+    def close(self):
+        """
+        Releases the workers of the evaluator
+        """
+        pass
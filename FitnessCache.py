@@ -0,0 +1,70 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from Genome import Genome
+
+
+class FitnessCache:
+    def __init__(self, capacity: int = 4096):
+        """
+        The FitnessCache remembers the fitness of genomes, keyed by the content of their genes,
+        so a genome which was already scored on a deterministic simulation does not have to be run again
+        When the cache is full, the entry which was used the longest time ago is thrown away
+        :param capacity: The largest number of fitnesses kept
+        """
+        self.capacity: int = capacity
+        self.entries: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def key(genome: Genome) -> bytes:
+        """
+        Gets the content key of a genome, a hash of its enabled connections and their weights in innovation order
+        Disabled genes do not change the network, so genomes which only differ in them share a key
+        :param genome: The genome to get the key of
+        :return: The key of the genome
+        """
+        gene_arrays = genome.gene_arrays
+        enabled = gene_arrays.enabled
+        content = hashlib.blake2b(digest_size=16)
+        content.update(np.array([genome.input_size, genome.output_size], dtype=np.int64).tobytes())
+        content.update(gene_arrays.in_nodes[enabled].astype(np.int64).tobytes())
+        content.update(gene_arrays.out_nodes[enabled].astype(np.int64).tobytes())
+        content.update(gene_arrays.weights[enabled].astype(float).tobytes())
+        return content.digest()
+
+    def get(self, key: bytes) -> Optional[float]:
+        """
+        Gets the fitness stored for a key, counting a hit or a miss
+        :param key: The content key of a genome
+        :return: The fitness of the genome, or None if it is not in the cache
+        """
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, key: bytes, fitness: float):
+        """
+        Stores the fitness for a key, throwing away the least recently used entry if the cache is full
+        :param key: The content key of a genome
+        :param fitness: The fitness of the genome
+        """
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        """
+        Gets the number of fitnesses in the cache
+        :return: The number of entries
+        """
+        return len(self.entries)
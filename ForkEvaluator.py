@@ -0,0 +1,88 @@
+import math
+import mmap
+import os
+import sys
+import traceback
+from typing import List
+
+import numpy as np
+
+from Evaluator import Evaluator
+from Genome import Genome
+from Simulation import Simulation
+
+
+class ForkEvaluator(Evaluator):
+    def __init__(self, simulation: Simulation, workers: int = None):
+        """
+        The ForkEvaluator forks a new set of worker processes every time it is asked to run genomes, only on Linux
+        The workers get the genomes, their gene pool and the simulation from the fork, copy on write,
+        so nothing is pickled, each worker runs a contiguous slice of the genomes
+        and writes their fitnesses into an array shared with the main process
+        Every worker restarts its simulation before each genome, so the fitnesses are the same as running
+        the genomes one at a time, for simulations where the score of a genome does not depend on
+        the genomes run before it and no random numbers are drawn
+        The networks which are built in a worker are thrown away with it, they are not kept by the genomes
+        Forking costs several milliseconds for each worker on every generation, where a WorkerPool only pays
+        for starting its workers once, so forking pays off when the genomes are large to send and slow to run,
+        Benchmarks/EvaluatorBenchmark compares the start up costs
+        :param simulation: The simulation every worker runs its genomes on
+        :param workers: The number of worker processes, None for one per core
+        """
+        self.simulation: Simulation = simulation
+        self.workers: int = workers if workers is not None else os.cpu_count()
+
+    def run_slice(self, fitnesses: np.array, genomes: List[Genome], batch_ids: List[int], start: int, stop: int):
+        """
+        Runs a slice of the genomes, in a forked worker
+        :param fitnesses: The shared array to write the fitness of each genome into
+        :param genomes: All the genomes to run
+        :param batch_ids: The batch id of each genome
+        :param start: The index of the first genome of the slice
+        :param stop: The index after the last genome of the slice
+        """
+        for i in range(start, stop):
+            network = genomes[i].network
+            network.batch_id = batch_ids[i]
+            self.simulation.restart()
+            fitnesses[i] = network.execute(self.simulation)
+
+    def evaluate(self, genomes: List[Genome], batch_ids: List[int]) -> List[float]:
+        """
+        Runs the simulation for every genome, forking one worker for each slice of the genomes
+        :param genomes: The genomes to run
+        :param batch_ids: The batch id of each genome
+        :return: The fitness of each genome
+        """
+        if len(genomes) == 0:
+            return []
+        memory = mmap.mmap(-1, len(genomes) * 8)
+        fitnesses = np.ndarray((len(genomes),), dtype=float, buffer=memory)
+        slice_size = math.ceil(len(genomes) / self.workers)
+        # Anything left in the buffers would be written again by every worker
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        processes = []
+        for start in range(0, len(genomes), slice_size):
+            process = os.fork()
+            if process == 0:
+                status = 0
+                try:
+                    self.run_slice(fitnesses, genomes, batch_ids, start, min(start + slice_size, len(genomes)))
+                except BaseException:
+                    traceback.print_exc()
+                    status = 1
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(status)
+            processes.append(process)
+
+        failed = [process for process in processes if os.waitpid(process, 0)[1] != 0]
+        result = fitnesses.tolist()
+        del fitnesses
+        memory.close()
+        if failed:
+            raise RuntimeError("%d forked workers failed to run their genomes" % len(failed))
+        return result
@@ -24,7 +24,7 @@ class Gene:
         self.innovation_number: int = innovation_number
         self.enabled: bool = enabled
         if gene_pool:
-            self.innovation_number = gene_pool.get_innovation_number(self.to_structure_gene())
+            self.innovation_number = gene_pool.get_connection_innovation(self.in_node, self.out_node)
 
     def mutate(self, conditions: Conditions.Conditions) -> Gene:
         """
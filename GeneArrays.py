@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+
+import Conditions
+import Gene
+
+
+class GeneArrays:
+    def __init__(self, innovation_numbers: np.array, in_nodes: np.array, out_nodes: np.array, weights: np.array,
+                 enabled: np.array):
+        """
+        The GeneArrays class holds the connection genes of a genome as parallel arrays, sorted by innovation number
+        Row i of every array together describes one gene
+        :param innovation_numbers: The innovation number of each gene
+        :param in_nodes: The node each connection starts at
+        :param out_nodes: The node each connection ends at
+        :param weights: The weight of each connection
+        :param enabled: The enabled bit of each connection
+        """
+        self.innovation_numbers: np.array = np.asarray(innovation_numbers, dtype=np.int64)
+        self.in_nodes: np.array = np.asarray(in_nodes, dtype=np.int64)
+        self.out_nodes: np.array = np.asarray(out_nodes, dtype=np.int64)
+        self.weights: np.array = np.asarray(weights, dtype=float)
+        self.enabled: np.array = np.asarray(enabled, dtype=bool)
+
+        if np.any(self.innovation_numbers[1:] < self.innovation_numbers[:-1]):
+            order = np.argsort(self.innovation_numbers, kind='stable')
+            self.innovation_numbers = self.innovation_numbers[order]
+            self.in_nodes = self.in_nodes[order]
+            self.out_nodes = self.out_nodes[order]
+            self.weights = self.weights[order]
+            self.enabled = self.enabled[order]
+
+    @staticmethod
+    def from_genes(genes: List[Gene.Gene]) -> GeneArrays:
+        """
+        Creates gene arrays from a list of genes
+        :param genes: The genes to copy into the arrays
+        :return: The gene arrays, sorted by innovation number
+        """
+        return GeneArrays(np.array([gene.innovation_number for gene in genes], dtype=np.int64),
+                          np.array([gene.in_node for gene in genes], dtype=np.int64),
+                          np.array([gene.out_node for gene in genes], dtype=np.int64),
+                          np.array([gene.weight for gene in genes], dtype=float),
+                          np.array([gene.enabled for gene in genes], dtype=bool))
+
+    def to_genes(self) -> List[Gene.Gene]:
+        """
+        Creates a list of gene objects from the arrays
+        :return: A list of new genes, sorted by innovation number
+        """
+        return list(map(Gene.Gene, self.weights.tolist(), self.in_nodes.tolist(), self.out_nodes.tolist(),
+                        self.innovation_numbers.tolist(), self.enabled.tolist()))
+
+    def get_gene(self, index: int) -> Gene.Gene:
+        """
+        Creates a gene object for one row of the arrays
+        :param index: The row of the gene
+        :return: A new gene
+        """
+        return Gene.Gene(float(self.weights[index]), int(self.in_nodes[index]), int(self.out_nodes[index]),
+                    int(self.innovation_numbers[index]), bool(self.enabled[index]))
+
+    def take(self, indices: np.array) -> GeneArrays:
+        """
+        Creates new gene arrays from some of the rows
+        :param indices: The rows to take, or a boolean mask of the rows
+        :return: The new gene arrays
+        """
+        return GeneArrays(self.innovation_numbers[indices], self.in_nodes[indices], self.out_nodes[indices],
+                          self.weights[indices], self.enabled[indices])
+
+    def append(self, weights: List[float], in_nodes: List[int], out_nodes: List[int], innovation_numbers: List[int],
+               enabled: List[bool]) -> GeneArrays:
+        """
+        Creates new gene arrays with extra genes added, the result is kept sorted by innovation number
+        :param weights: The weights of the new genes
+        :param in_nodes: The in nodes of the new genes
+        :param out_nodes: The out nodes of the new genes
+        :param innovation_numbers: The innovation numbers of the new genes
+        :param enabled: The enabled bits of the new genes
+        :return: The new gene arrays
+        """
+        return GeneArrays(np.concatenate([self.innovation_numbers, np.asarray(innovation_numbers, dtype=np.int64)]),
+                          np.concatenate([self.in_nodes, np.asarray(in_nodes, dtype=np.int64)]),
+                          np.concatenate([self.out_nodes, np.asarray(out_nodes, dtype=np.int64)]),
+                          np.concatenate([self.weights, np.asarray(weights, dtype=float)]),
+                          np.concatenate([self.enabled, np.asarray(enabled, dtype=bool)]))
+
+    def match(self, other: GeneArrays) -> np.array:
+        """
+        Finds the matching gene in other gene arrays for every gene, by innovation number
+        Genes are paired off one to one in order, so a repeated innovation number
+        matches as many times as it appears in both arrays
+        :param other: The gene arrays to match against
+        :return: The row of the matching gene in the other arrays for every gene, -1 for genes without a match
+        """
+        rank = np.arange(len(self)) - self.innovation_numbers.searchsorted(self.innovation_numbers, 'left')
+        left = other.innovation_numbers.searchsorted(self.innovation_numbers, 'left')
+        right = other.innovation_numbers.searchsorted(self.innovation_numbers, 'right')
+        return np.where(rank < right - left, left + rank, -1)
+
+    def align(self, other: GeneArrays) -> Tuple[np.array, np.array, np.array]:
+        """
+        Lines the genes up with the genes of other gene arrays by innovation number
+        Genes without a match are disjoint when the other arrays have a later gene, otherwise they are excess
+        :param other: The gene arrays to line up with
+        :return: A Tuple containing, the row of the matching gene in the other arrays for every gene or -1,
+            a mask of the disjoint genes of these arrays, and a mask of the disjoint genes of the other arrays
+        """
+        partners = self.match(other)
+        other_partners = other.match(self)
+        disjoint = np.logical_and(partners < 0, self.innovation_numbers < other.innovation_numbers[-1])
+        other_disjoint = np.logical_and(other_partners < 0, other.innovation_numbers < self.innovation_numbers[-1])
+        return partners, disjoint, other_disjoint
+
+    def mutate(self, conditions: Conditions.Conditions) -> GeneArrays:
+        """
+        Creates mutated gene arrays, with the same structure as the current
+        Each weight, with the same odds as Gene.mutate, is shifted, completely randomized, or not mutated
+        Each decision is made for every gene at once with one draw from the random generator of the conditions
+        :param conditions: The Conditions objects which contains the parameters of the mutation
+        :return: New mutated gene arrays with the same structure
+        """
+        random_generator = conditions.random_generator
+        size = len(self)
+        mutated = random_generator.random(size) < conditions.gene_weight_probability
+        randomized = random_generator.random(size) < conditions.gene_random_probability
+        random_weights = random_generator.uniform(conditions.gene_min_weight, conditions.gene_max_weight, size)
+        shifted_weights = np.clip(self.weights + random_generator.uniform(-conditions.gene_weight_shift,
+                                                                          conditions.gene_weight_shift, size),
+                                  conditions.gene_min_weight, conditions.gene_max_weight)
+
+        weights = np.where(mutated, np.where(randomized, random_weights, shifted_weights), self.weights)
+        return GeneArrays(self.innovation_numbers.copy(), self.in_nodes.copy(), self.out_nodes.copy(), weights,
+                          self.enabled.copy())
+
+    def copy(self) -> GeneArrays:
+        """
+        Returns a copy of the gene arrays
+        :return: New gene arrays with copies of the arrays
+        """
+        return GeneArrays(self.innovation_numbers.copy(), self.in_nodes.copy(), self.out_nodes.copy(),
+                          self.weights.copy(), self.enabled.copy())
+
+    def __len__(self) -> int:
+        """
+        The number of genes
+        :return: The number of genes in the arrays
+        """
+        return len(self.innovation_numbers)
@@ -1,25 +1,40 @@
 from __future__ import annotations
 
-from typing import Dict
+from typing import Dict, Tuple, List
+
+import numpy as np
+
 import Gene
+import GeneArrays
+from NodeTable import NodeTable
 import StructureGene
 from functions import surround_tag, remove_tag, load_dict, save_dict
 
 
 class GenePool:
-    def __init__(self, innovation_number: int, node_number: int, node_depths: Dict[int: int]):
+    def __init__(self, innovation_number: int, node_number: int, node_depths: Dict[int: int],
+                 persistent: bool = False, registry_limit: int = None, node_table: NodeTable = None):
         """
         The GenePool class keeps track of the next available innovation number, and node number
         It also tracks the new connection innovations and new nodes in the current generation
+        A persistent GenePool keeps tracking the innovations for the whole run instead,
+        so a structure found again in a later generation gets the same innovation number
         :param innovation_number: The next available innovation number
         :param node_number: The next available node number
-        :param node_depths: A dictionary for keeping track of the relative depth of nodes
+        :param node_depths: A dictionary of the starting depths of nodes
+        :param persistent: If true the innovations are kept from generation to generation
+        :param registry_limit: The number of connection innovations a persistent GenePool keeps,
+            before the innovations no living genome carries are evicted, None to never evict
+        :param node_table: A table of node depths to share, which is used instead of the node depths
         """
         self.innovation_number: int = innovation_number
         self.node_number: int = node_number
-        self.connection_innovations: Dict[StructureGene.StructureGene, int] = {}
-        self.node_innovations: Dict[Gene.Gene, int] = {}
-        self.node_depths: Dict[int: int] = node_depths
+        self.connection_innovations: Dict[Tuple[int, int], int] = {}
+        self.node_innovations: Dict[int, int] = {}
+        # Depths never change once set, so every GenePool of a run shares one table
+        self.node_table: NodeTable = node_table if node_table is not None else NodeTable(node_depths)
+        self.persistent: bool = persistent
+        self.registry_limit: int = registry_limit
 
     def get_innovation_number(self, gene: StructureGene.StructureGene):
         """
@@ -29,31 +44,50 @@ class GenePool:
         :param gene: A structure gene which needs the innovation number
         :return: An innovation number connected to the structure gene
         """
-        if gene in self.connection_innovations:
-            return self.connection_innovations[gene]
-        else:
-            self.connection_innovations[gene] = self.innovation_number
+        return self.get_connection_innovation(gene.in_node, gene.out_node)
+
+    def get_connection_innovation(self, in_node: int, out_node: int) -> int:
+        """
+        Gets the innovation number associated with a connection
+        if the innovation is already discovered in the current generation
+        the same number is used
+        Connections are keyed by their (in_node, out_node) tuple, so no Structure Gene is needed for the lookup
+        :param in_node: The node the connection starts at
+        :param out_node: The node the connection ends at
+        :return: An innovation number connected to the connection
+        """
+        key = (in_node, out_node)
+        innovation_number = self.connection_innovations.get(key)
+        if innovation_number is None:
+            innovation_number = self.innovation_number
+            self.connection_innovations[key] = innovation_number
             self.innovation_number += 1
-            return self.innovation_number - 1
+        return innovation_number
 
-    def get_node_number(self, gene: Gene.Gene):
+    def get_node_number(self, gene: Gene.Gene, genome_nodes: List[int] = None):
         """
         Gets the node number associated with a Gene
         if the innovation is already discovered in the current generation
         the same number is used
+        A persistent GenePool remembers splits from earlier generations, so a genome can split a gene again
+        after it already holds the node of that split, the genome then gets a new node which is not kept,
+        otherwise it would get the same two connections, with the same innovation numbers, a second time
         :param gene: A gene which is splitting to create the node
+        :param genome_nodes: The nodes the splitting genome already has, None to always reuse a known node
         :return: A node number created by splitting the gene
         """
-        if gene in self.node_innovations:
-            return self.node_innovations[gene]
-        else:
-            self.node_innovations[gene] = self.node_number
-            self.node_number += 1
-            in_node_depth = self.node_depths[gene.in_node]
-            out_node_depth = self.node_depths[gene.out_node]
-            new_depth = (in_node_depth + out_node_depth) // 2
-            self.node_depths[self.node_number - 1] = new_depth
-            return self.node_number - 1
+        node = self.node_innovations.get(gene.innovation_number)
+        if node is not None and (genome_nodes is None or node not in genome_nodes):
+            return node
+        node = self.node_number
+        self.node_number += 1
+        if gene.innovation_number not in self.node_innovations:
+            self.node_innovations[gene.innovation_number] = node
+        in_node_depth = self.node_table.get_depth(gene.in_node)
+        out_node_depth = self.node_table.get_depth(gene.out_node)
+        new_depth = (in_node_depth + out_node_depth) // 2
+        self.node_table.add_node(node, new_depth)
+        return node
 
     def get_depth(self, node: int) -> int:
         """
@@ -61,16 +95,57 @@ class GenePool:
         :param node: The node to get the depth of
         :return: The depth of the node
         """
-        return self.node_depths[node]
+        return self.node_table.get_depth(node)
+
+    def set_depth(self, node: int, depth: int):
+        """
+        Sets the depth of a node in the network
+        :param node: The node to set the depth of
+        :param depth: The depth of the node
+        """
+        self.node_table.set_depth(node, depth)
 
-    def next(self) -> GenePool:
+    @property
+    def node_depths(self) -> Dict[int, int]:
+        """
+        The depths of the nodes as a dictionary, changing it does not change the depths
+        :return: A dictionary from each node to its depth
+        """
+        return self.node_table.to_dict()
+
+    def next(self, genes: List[GeneArrays.GeneArrays] = None) -> GenePool:
         """
         Creates the GenePool for the next Generation
-        Keeps the innovation number and node number, as well as the depths for the nodes
-        Clears the innovation dictionaries
+        Keeps the innovation number and node number, and shares the table of node depths
+        Clears the innovation dictionaries, unless the GenePool is persistent
+        A persistent GenePool hands its innovation dictionaries on, evicting innovations when they pass the limit
+        :param genes: The genes of every living genome, used for eviction
         :return: The next GenePool
         """
-        return GenePool(self.innovation_number, self.node_number, self.node_depths.copy())
+        gene_pool = GenePool(self.innovation_number, self.node_number, None,
+                             self.persistent, self.registry_limit, self.node_table)
+        if self.persistent:
+            gene_pool.connection_innovations = self.connection_innovations
+            gene_pool.node_innovations = self.node_innovations
+            if (genes is not None and self.registry_limit is not None and
+                    len(gene_pool.connection_innovations) > self.registry_limit):
+                gene_pool.evict(genes)
+        return gene_pool
+
+    def evict(self, genes: List[GeneArrays.GeneArrays]):
+        """
+        Forgets the innovations which no living genome carries
+        A connection innovation is forgotten when no genome has a gene with its innovation number,
+        and a node innovation when no genome has the gene it splits
+        If the structure is found again it gets a new innovation number, since there is no gene left to line up with
+        :param genes: The genes of every living genome
+        """
+        carried = set(np.unique(np.concatenate([gene_arrays.innovation_numbers for gene_arrays in genes])).tolist()
+                      if genes else [])
+        self.connection_innovations = {connection: innovation_number for connection, innovation_number
+                                       in self.connection_innovations.items() if innovation_number in carried}
+        self.node_innovations = {innovation_number: node for innovation_number, node
+                                 in self.node_innovations.items() if innovation_number in carried}
 
     def __str__(self) -> str:
 
@@ -78,9 +153,14 @@ class GenePool:
         save_string += surround_tag("innovation_number", str(self.innovation_number))
         save_string += surround_tag("node_number", str(self.node_number))
 
-        save_string += surround_tag("connection_innovations", save_dict(self.connection_innovations))
+        save_string += surround_tag("connection_innovations",
+                                    save_dict({StructureGene.StructureGene(in_node, out_node): innovation_number
+                                               for (in_node, out_node), innovation_number
+                                               in self.connection_innovations.items()}))
         save_string += surround_tag("node_innovations", save_dict(self.node_innovations))
         save_string += surround_tag("node_depths", save_dict(self.node_depths))
+        save_string += surround_tag("persistent", str(self.persistent))
+        save_string += surround_tag("registry_limit", str(self.registry_limit))
         return save_string
 
     @staticmethod
@@ -90,14 +170,23 @@ class GenePool:
         connection_innovations_str, string = remove_tag("connection_innovations", string)
         node_innovations_str, string = remove_tag("node_innovations", string)
         node_depths_str, string = remove_tag("node_depths", string)
+        # Older saves have no persistent settings
+        persistent_str, string = remove_tag("persistent", string) if string else (None, None)
+        registry_limit_str, string = remove_tag("registry_limit", string) if string else (None, None)
 
         innovation_number = int(innovation_number_str)
         node_number = int(node_number_str)
-        connection_innovations = load_dict(connection_innovations_str, StructureGene.StructureGene, int)
-        node_innovations = load_dict(node_innovations_str, Gene.Gene, int)
+        connection_innovations = {(gene.in_node, gene.out_node): innovation_number for gene, innovation_number
+                                  in load_dict(connection_innovations_str, StructureGene.StructureGene, int).items()}
+        # Older saves key the node innovations by the whole split gene, only its innovation number is needed
+        node_innovations = {int(key) if not key.startswith("<") else Gene.Gene.load(key).innovation_number: node
+                            for key, node in load_dict(node_innovations_str, str, int).items()}
         node_depths = load_dict(node_depths_str, int, int)
 
-        gene_pool = GenePool(innovation_number, node_number, node_depths)
+        persistent = persistent_str == "True"
+        registry_limit = int(registry_limit_str) if registry_limit_str not in (None, "None") else None
+
+        gene_pool = GenePool(innovation_number, node_number, node_depths, persistent, registry_limit)
         gene_pool.connection_innovations = connection_innovations
         gene_pool.node_innovations = node_innovations
 
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 from Conditions import Conditions
+from Evaluator import Evaluator
+from FitnessCache import FitnessCache
 from GenePool import GenePool
 from Genome import Genome
 from Population import Population
@@ -26,21 +28,27 @@ class Generation:
         :return: The next generation
         """
         new_population = self.population.next(conditions, self.gene_pool)
-        new_gene_pool = self.gene_pool.next()
+        new_gene_pool = self.gene_pool.next([genome.gene_arrays for genome in new_population.get_genomes()])
         return Generation(self.generation + 1, new_population, new_gene_pool)
 
     def run(self, simulation: Simulation, conditions: Conditions, batched: bool = False,
-            batch_size: int = None, screen=None, shape=None):
+            batch_size: int = None, screen=None, shape=None, fitness_cache: FitnessCache = None,
+            evaluator: Evaluator = None):
         """
         Runs a simulation on every member of the population
+        The networks of the new genomes are built together before the simulation starts
         :param batched: If false run sim separately on each genome, if true run them as groups
         :param batch_size: The size of the batches to run, if None, then the batch will be the size of all the genomes
         :param simulation: The simulation to run
         :param conditions: The conditions to use when running the simulation
         :param shape: The shape to draw the population on
         :param screen: The screen to draw on
+        :param fitness_cache: The cache of known fitnesses, only to be used with deterministic simulations
+        :param evaluator: The evaluator which runs the genomes when not batched, None to run them one at a time
         """
-        self.population.run(simulation, conditions, batched, batch_size, screen, shape)
+        self.population.compile_networks(self.gene_pool)
+        self.population.run(simulation, conditions, batched, batch_size, screen, shape, fitness_cache=fitness_cache,
+                            evaluator=evaluator)
 
     def get_score(self, conditions:Conditions) -> float:
         """
@@ -56,7 +64,7 @@ class Generation:
         :return: The genome with the highest score in the population
         """
         genomes = self.population.get_genomes()
-        return max(genomes)
+        return genomes[int(self.population.get_fitnesses().argmax())]
 
     def __str__(self) -> str:
         save_string = ""
@@ -70,6 +78,6 @@ class Generation:
         generation_count, string = remove_tag("generation_count", string)
         population_str, string = remove_tag("population", string)
         gene_pool_str, string = remove_tag("gene_pool", string)
-        population = Population.load(population_str)
         gene_pool = GenePool.load(gene_pool_str)
+        population = Population.load(population_str, gene_pool)
         return Generation(int(generation_count), population, gene_pool)
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
 import random
-from typing import List, Tuple
+from typing import List, Tuple, Union
+
+import numpy as np
+
 from Gene import Gene
+from EdgeIndex import EdgeIndex
+from GeneArrays import GeneArrays
 from NeatErrors import NetworkFullError
 from Network import Network
 from GenePool import GenePool
@@ -10,30 +15,108 @@ from Conditions import Conditions
 from Simulation import Simulation
 from functions import surround_tag, remove_tag
 
-from processing_genes import process_genes
+from processing_genes import build_network
 
 
 class Genome:
-    def __init__(self, genes: List[Gene], input_size: int, output_size: int, gene_pool: GenePool):
+    def __init__(self, genes: Union[GeneArrays, List[Gene]], input_size: int, output_size: int,
+                 gene_pool: GenePool = None):
         """
         The genome class is a collection of genes which represents a network
-        :param genes: The genes of the genome
+        The genes are stored as parallel arrays sorted by innovation number
+        The network is only built the first time it is needed
+        :param genes: The genes of the genome, either as gene arrays or a list of genes
         :param input_size: The number of input nodes
         :param output_size: The number of output nodes
+        :param gene_pool: The GenePool with the depths of the nodes, needed to build the network
         """
         assert len(genes) > 0
-        self.genes: List[Gene] = genes  # its is assumed that the genes will be in sorted order
-        weight_matrix, enabled_matrix, middle_size, middles = process_genes(self.genes, input_size, output_size, gene_pool)
-        # print("GENOME",weight_matrix.shape, enabled_matrix.shape)
+        self.gene_arrays: GeneArrays = genes if isinstance(genes, GeneArrays) else GeneArrays.from_genes(genes)
+        # Matching, distances and networks all assume a genome holds each innovation once
+        assert not np.any(self.gene_arrays.innovation_numbers[1:] == self.gene_arrays.innovation_numbers[:-1])
+        self.gene_pool: GenePool = gene_pool
+        self.cached_network: Network = None
+        self.cached_edge_index: EdgeIndex = None
 
-        self.network: Network = Network(weight_matrix, enabled_matrix, input_size, output_size, middle_size)
         self.raw_fitness: float = 0
+        self.fitness_array: np.array = None
+        self.fitness_slot: int = None
+        # Set by a WorkerPool the first time the genome is sent to a worker, so the worker can keep it
+        self.evaluation_id: int = None
         self.input_size: int = input_size
         self.output_size: int = output_size
         self.start_nodes: List[int] = list(range(1, input_size + 1))
-        self.middle_nodes: List[int] = middles
+        self.middle_nodes: List[int] = self.find_middle_nodes()
         self.end_nodes: List[int] = list(range(0, -output_size, -1))
 
+    @property
+    def genes(self) -> List[Gene]:
+        """
+        The genes of the genome as gene objects, sorted by innovation number
+        The genes are new copies, changing them does not change the genome
+        :return: A list of the genes of the genome
+        """
+        return self.gene_arrays.to_genes()
+
+    @genes.setter
+    def genes(self, genes: List[Gene]):
+        """
+        Replaces the genes of the genome, the network is rebuilt the next time it is used
+        :param genes: The new genes of the genome
+        """
+        self.gene_arrays = GeneArrays.from_genes(genes)
+        self.invalidate_network()
+
+    @property
+    def network(self) -> Network:
+        """
+        The network represented by the genes, built from the genes the first time it is used
+        :return: The network of the genome
+        """
+        if self.cached_network is None:
+            self.cached_network, middles = build_network(self.gene_arrays, self.input_size, self.output_size, self.gene_pool)
+        return self.cached_network
+
+    def get_edge_index(self, gene_pool: GenePool) -> EdgeIndex:
+        """
+        Gets the index of the connections which could be added to the genome, built the first time it is used
+        :param gene_pool: The GenePool which has data on the depth of nodes
+        :return: The edge index of the genome
+        """
+        if self.cached_edge_index is None:
+            self.cached_edge_index = EdgeIndex(self.gene_arrays, self.start_nodes + self.middle_nodes,
+                                               self.middle_nodes + self.start_nodes, gene_pool)
+        return self.cached_edge_index
+
+    def inherit_edge_index(self, parent: Genome, gene_pool: GenePool):
+        """
+        Gives the genome the edge index of a parent with the same nodes, updated with the genes which differ,
+        so a child does not index all its genes again, the parent keeps its index for its other children
+        A child with other nodes builds its own index the first time it is used
+        :param parent: The genome the genes of the current genome were bred from
+        :param gene_pool: The GenePool which has data on the depth of nodes
+        """
+        if self.cached_edge_index is None and self.middle_nodes == parent.middle_nodes:
+            self.cached_edge_index = parent.get_edge_index(gene_pool).derive(parent.gene_arrays, self.gene_arrays)
+
+    def find_middle_nodes(self) -> List[int]:
+        """
+        Finds the nodes of the genes which are not input or output nodes
+        :return: A list of the middle nodes
+        """
+        in_nodes, out_nodes = self.gene_arrays.in_nodes, self.gene_arrays.out_nodes
+        middle_nodes = np.concatenate([in_nodes[in_nodes > self.input_size], out_nodes[out_nodes > 0]])
+        return np.flatnonzero(np.bincount(middle_nodes)).tolist()
+
+    def invalidate_network(self):
+        """
+        Throws away the network and edge index, they are rebuilt from the genes the next time they are used
+        Must be called after changing the structure or weights of the gene arrays in place
+        """
+        self.cached_network = None
+        self.cached_edge_index = None
+        self.middle_nodes = self.find_middle_nodes()
+
     def add_node(self, gene_pool: GenePool, conditions: Conditions) -> Genome:
         """
         Creates a new genome. Splits a randomly selected connection into two connections which share a new node
@@ -52,26 +135,19 @@ class Genome:
         :return: Returns a copy of the current genome, but with a connection split with a new node added
         """
         conditions.new_node_count += 1
-        splitting_gene: Gene = random.choice(self.genes)
-        new_node = gene_pool.get_node_number(splitting_gene)
+        splitting_gene: Gene = self.gene_arrays.get_gene(random.choice(range(len(self.gene_arrays))))
+        new_node = gene_pool.get_node_number(splitting_gene, self.middle_nodes)
 
         in_gene = Gene(1.0, splitting_gene.in_node, new_node, 0, gene_pool=gene_pool)
         out_gene = Gene(splitting_gene.weight, new_node, splitting_gene.out_node, 0, gene_pool=gene_pool)
 
-        new_genes = []
-
-        for gene in self.genes:
-            if gene == splitting_gene:
-                disabled_gene = gene.copy()
-                disabled_gene.enabled = False
-                new_genes.append(disabled_gene)
-            else:
-                new_genes.append(gene.copy())
-
-        new_genes.append(in_gene)
-        new_genes.append(out_gene)
+        new_arrays = self.gene_arrays.copy()
+        new_arrays.enabled[new_arrays.innovation_numbers == splitting_gene.innovation_number] = False
+        new_arrays = new_arrays.append([in_gene.weight, out_gene.weight], [in_gene.in_node, out_gene.in_node],
+                                       [in_gene.out_node, out_gene.out_node],
+                                       [in_gene.innovation_number, out_gene.innovation_number], [True, True])
 
-        return Genome(new_genes,self.input_size,self.output_size, gene_pool)
+        return Genome(new_arrays, self.input_size, self.output_size, gene_pool)
 
     def add_connection(self, gene_pool: GenePool, conditions: Conditions) -> Genome:
         """
@@ -81,28 +157,20 @@ class Genome:
         :return: Returns a copy of the current genome, but with a new connection
         """
         conditions.new_connection_count += 1
-        endings = []
-        starts = self.start_nodes + self.middle_nodes
-        start_node = None
-        while (not endings) and starts:
-            start_node = random.choice(starts)
-            starts.remove(start_node)
-
-            endings = list(filter(lambda end_node: gene_pool.get_depth(end_node) > gene_pool.get_depth(start_node),
-                                  self.middle_nodes + self.start_nodes))
-
-            used_genes = (filter(lambda gene: gene.in_node == start_node, self.genes))
-            for gene in used_genes:
-                if gene.out_node in endings:
-                    endings.remove(gene.out_node)
-        if endings:
-            end_node = random.choice(endings)
+        edge_index = self.get_edge_index(gene_pool)
+        connection = edge_index.sample()
+        if connection is not None:
+            start_node, end_node = connection
             new_gene = Gene(random.random() * (
                     conditions.gene_max_weight - conditions.gene_min_weight) + conditions.gene_min_weight,
                             start_node, end_node, 0, gene_pool=gene_pool)
-            new_genes = list(map(Gene.copy, self.genes))
-            new_genes.append(new_gene)
-            return Genome(new_genes, self.input_size, self.output_size, gene_pool)
+            new_arrays = self.gene_arrays.append([new_gene.weight], [new_gene.in_node], [new_gene.out_node],
+                                                 [new_gene.innovation_number], [new_gene.enabled])
+            new_genome = Genome(new_arrays, self.input_size, self.output_size, gene_pool)
+            # The nodes are the same, so the index is carried over with the one new connection
+            new_genome.cached_edge_index = edge_index.copy()
+            new_genome.cached_edge_index.add(start_node, end_node)
+            return new_genome
         else:
             conditions.new_connection_count -= 1
             # raise NetworkFullError("add connection")
@@ -116,28 +184,22 @@ class Genome:
         :param conditions: The Conditions to compare under, includes weight, disjoint and excess coefficients
         :return: A float measuring similarity of the genomes, 0.0 being the most similar
         """
-        self_index = 0
-        other_index = 0
-        comparison = 0.0
-        disjoint_coefficient = conditions.genome_disjoint_coefficient / (1 if conditions.genome_min_divide >= len(self.genes) else len(self.genes))
-        excess_coefficient = conditions.genome_excess_coefficient / (1 if conditions.genome_min_divide >= len(self.genes) else len(self.genes))
-
-        while len(self.genes) > self_index and len(other.genes) > other_index:
-            if self.genes[self_index] == other.genes[other_index]:
-                comparison += (abs(self.genes[self_index].innovation_number -
-                                   other.genes[other_index].innovation_number) *
-                               conditions.genome_weight_coefficient)
-                self_index += 1
-                other_index += 1
-            elif self.genes[self_index] < other.genes[other_index]:
-                comparison += disjoint_coefficient
-                self_index += 1
-            else:
-                comparison += disjoint_coefficient
-                other_index += 1
-        comparison += (len(self.genes) - self_index + len(
-            other.genes) - other_index) * excess_coefficient
-        return comparison
+        self_innovations = self.gene_arrays.innovation_numbers
+        other_innovations = other.gene_arrays.innovation_numbers
+        disjoint_coefficient = conditions.genome_disjoint_coefficient / (1 if conditions.genome_min_divide >= len(self_innovations) else len(self_innovations))
+        excess_coefficient = conditions.genome_excess_coefficient / (1 if conditions.genome_min_divide >= len(self_innovations) else len(self_innovations))
+
+        # Matching genes share an innovation number, so they add no weight term
+        # Only the counts are needed, so the disjoint genes of the other genome are counted as the genes
+        # before the last gene of the current genome, less the ones which match
+        matches = self.gene_arrays.match(other.gene_arrays) >= 0
+        matching = int(np.count_nonzero(matches))
+        before_last = self_innovations < self_innovations[-1]
+        disjoint = (int(np.count_nonzero(np.logical_and(~matches, self_innovations < other_innovations[-1]))) +
+                    int(other_innovations.searchsorted(self_innovations[-1], 'left')) -
+                    int(np.count_nonzero(np.logical_and(matches, before_last))))
+        excess = len(self_innovations) + len(other_innovations) - 2 * matching - disjoint
+        return disjoint * disjoint_coefficient + excess * excess_coefficient
 
     def breed(self, other: Genome, gene_pool: GenePool, conditions: Conditions) -> Genome:
         """
@@ -148,53 +210,43 @@ class Genome:
         :param conditions: The conditions the breeding is occuring in, controls the rate of being disabled
         """
         # print("BREEDING", self)
-        self_index = 0
-        other_index = 0
-        new_genes = []
-        while len(self.genes) > self_index and len(other.genes) > other_index:
-            if self.genes[self_index] == other.genes[other_index]:
-                new_gene = self.genes[self_index].copy()
-                new_gene.weight = random.choice([self.genes[self_index].weight, other.genes[other_index].weight])
-                new_gene.enabled = ((self.genes[self_index].enabled or other.genes[other_index].enabled) or
-                                    random.random() > conditions.genome_disable_probability)
-                new_genes.append(new_gene)
-                # if not new_gene.enabled:
-                #     print("DISABLED GENE both")
-                #     print(new_gene)
-                #     print(self.genes[self_index])
-                #     print(other.genes[other_index])
-                self_index += 1
-                other_index += 1
-            elif self.genes[self_index] < other.genes[other_index]:
-                if self.raw_fitness >= other.raw_fitness:
-                    new_gene = self.genes[self_index].copy()
-                    new_gene.enabled = (self.genes[self_index].enabled or
-                                        random.random() > conditions.genome_disable_probability)
-                    new_genes.append(new_gene)
-                    # if not new_gene.enabled:
-                    #     print("DISABLED GENE self")
-                    #     print(new_gene)
-                    #     print(self.genes[self_index])
-                self_index += 1
-            else:
-                if self.raw_fitness <= other.raw_fitness:
-                    new_gene = other.genes[other_index].copy()
-                    new_gene.enabled = (other.genes[other_index].enabled or
-                                        random.random() > conditions.genome_disable_probability)
-                    new_genes.append(new_gene)
-                    # if not new_gene.enabled:
-                    #     print("DISABLED GENE other")
-                    #     print(new_gene)
-                    #     print(other.genes[other_index])
-                other_index += 1
-
-
-        for i in range(len(new_genes)):
-            new_genes[i] = new_genes[i].mutate(conditions)
-
-        new_genome = Genome(new_genes, self.input_size, self.output_size,gene_pool)
+        random_generator = conditions.random_generator
+        self_arrays, other_arrays = self.gene_arrays, other.gene_arrays
+        partners, self_disjoint, other_disjoint = self_arrays.align(other_arrays)
+        matching = partners >= 0
+
+        # Matching genes come from both parents, disjoint genes only come from the fitter parent,
+        # or from both when they are as fit. Excess genes are not inherited
+        self_taken = np.logical_or(matching, np.logical_and(self_disjoint, self.raw_fitness >= other.raw_fitness))
+        other_taken = np.logical_and(other_disjoint, self.raw_fitness <= other.raw_fitness)
+        self_partners = partners[self_taken]
+        self_matching = self_partners >= 0
+
+        self_weights = self_arrays.weights[self_taken]
+        self_weights[self_matching] = np.where(random_generator.random(np.count_nonzero(self_matching)) < 0.5,
+                                               self_weights[self_matching],
+                                               other_arrays.weights[self_partners[self_matching]])
+        self_enabled = self_arrays.enabled[self_taken]
+        self_enabled[self_matching] |= other_arrays.enabled[self_partners[self_matching]]
+
+        # The taken genes are merged back in innovation order
+        innovation_numbers = np.concatenate([self_arrays.innovation_numbers[self_taken],
+                                             other_arrays.innovation_numbers[other_taken]])
+        order = np.argsort(innovation_numbers, kind='stable')
+        enabled = np.concatenate([self_enabled, other_arrays.enabled[other_taken]])[order]
+        enabled |= random_generator.random(len(enabled)) > conditions.genome_disable_probability
+        new_arrays = GeneArrays(innovation_numbers[order],
+                                np.concatenate([self_arrays.in_nodes[self_taken], other_arrays.in_nodes[other_taken]])[order],
+                                np.concatenate([self_arrays.out_nodes[self_taken], other_arrays.out_nodes[other_taken]])[order],
+                                np.concatenate([self_weights, other_arrays.weights[other_taken]])[order],
+                                enabled)
+
+        new_arrays = new_arrays.mutate(conditions)
+
+        new_genome = Genome(new_arrays, self.input_size, self.output_size, gene_pool)
 
         if random.random() < conditions.genome_connection_probability:
+            new_genome.inherit_edge_index(self, gene_pool)
             new_genome = new_genome.add_connection(gene_pool, conditions)
 
         if random.random() < conditions.genome_node_probability:
@@ -209,14 +261,14 @@ class Genome:
         :param simulation: The simulation to run
         """
         self.network.batch_id = batch_id
-        self.raw_fitness = self.network.execute(simulation)
+        self.set_fitness(self.network.execute(simulation))
 
     def copy(self) -> Genome:
         """
         Makes a copy of the genome
         :return: a copy of the genome
         """
-        return Genome(list(map(Gene.copy, self.genes)), self.input_size, self.output_size)
+        return Genome(self.gene_arrays.copy(), self.input_size, self.output_size, self.gene_pool)
 
     def __eq__(self, other: Genome) -> bool:
         """
@@ -277,10 +329,21 @@ class Genome:
 
     def set_fitness(self, raw_fitness: float):
         """
-        Sets the score of the genome
+        Sets the score of the genome, and its slot in the fitness array of its population
         :param raw_fitness: The new genome score
         """
         self.raw_fitness = raw_fitness
+        if self.fitness_array is not None:
+            self.fitness_array[self.fitness_slot] = raw_fitness
+
+    def bind_fitness(self, fitness_array: np.array, fitness_slot: int):
+        """
+        Binds the genome to a slot of a fitness array, which set_fitness keeps up to date
+        :param fitness_array: The fitness array of the population of the genome
+        :param fitness_slot: The index of the genome in the fitness array
+        """
+        self.fitness_array = fitness_array
+        self.fitness_slot = fitness_slot
 
     def __str__(self) -> str:
 
@@ -289,13 +352,13 @@ class Genome:
         save_string += surround_tag("output_size", str(self.output_size))
         save_string += surround_tag("raw_fitness", str(self.raw_fitness))
         genes_string = ""
-        for gene in self.genes:
-            genes_string += surround_tag("gene", str(gene))
+        for i in range(len(self.gene_arrays)):
+            genes_string += surround_tag("gene", str(self.gene_arrays.get_gene(i)))
         save_string += surround_tag("genes", genes_string)
         return save_string
 
     @staticmethod
-    def load(string) -> Genome:
+    def load(string, gene_pool: GenePool = None) -> Genome:
         input_size_str, string = remove_tag("input_size", string)
         output_size_str, string = remove_tag("output_size", string)
         raw_fitness_str, string = remove_tag("raw_fitness", string)
@@ -309,6 +372,6 @@ class Genome:
             gene_str, genes_str = remove_tag("gene", genes_str)
             gene = Gene.load(gene_str)
             genes.append(gene)
-        genome = Genome(genes, input_size, output_size)
+        genome = Genome(genes, input_size, output_size, gene_pool)
         genome.raw_fitness = raw_fitness
         return genome
\ No newline at end of file
@@ -5,31 +5,42 @@ from time import time
 from typing import List
 
 from Conditions import Conditions
+from Evaluator import Evaluator
+from FitnessCache import FitnessCache
 from Gene import Gene
 from GenePool import GenePool
 from Generation import Generation
 from Genome import Genome
 from Population import Population
 from Simulation import Simulation
+from WorkerPool import WorkerPool
 from functions import surround_tag, remove_tag
 import pygame
 
 
 class NeatApplication:
-    def __init__(self, conditions: Conditions, simulation: Simulation, load_file=None, screen=None):
+    def __init__(self, conditions: Conditions, simulation: Simulation, load_file=None, screen=None,
+                 evaluator: Evaluator = None):
         """
         The Neat Application runs the Neat algorithm on a simulation, using the given conditions
         :param conditions: The conditions to use when running the algorithm
         :param simulation: The simulation Neat will be running
         :param load_file: A file to load previous data from
+        :param evaluator: The evaluator which runs the genomes when not batched, such as a ProcessEvaluator,
+            None to run them one at a time
         """
         self.simulation: Simulation = simulation
+        self.evaluator: Evaluator = evaluator
         self.conditions: Conditions = conditions
         self.past: List[Generation] = []
         self.screen = screen
         self.log_file = "scores/score_%d.csv" % time()
+        self.fitness_cache: FitnessCache = None
+        if simulation.deterministic and conditions.fitness_cache_size > 0:
+            self.fitness_cache = FitnessCache(conditions.fitness_cache_size)
         if load_file is None:
-            gene_pool = GenePool(0, simulation.get_data_size() + 1, {})
+            gene_pool = GenePool(0, simulation.get_data_size() + 1, {}, conditions.innovation_persistent,
+                                 conditions.innovation_registry_limit)
             genomes = self.start_genomes(gene_pool, conditions)
             population = Population([])
             population.add_all_genomes(genomes, conditions)
@@ -38,6 +49,26 @@ class NeatApplication:
         else:
             raise NotImplementedError("Saving is coming soon")
 
+    def start_worker_pool(self, workers: int = None) -> WorkerPool:
+        """
+        Starts a pool of worker processes which runs the genomes when not batched, for the rest of the run
+        The workers keep their simulation and the networks of carried over genomes from generation to generation
+        :param workers: The number of worker processes, None for one per core
+        :return: The worker pool, which is also used as the evaluator
+        """
+        self.close()
+        self.evaluator = WorkerPool(self.simulation, self.simulation.get_data_size(),
+                                    self.simulation.get_controls_size(), workers)
+        return self.evaluator
+
+    def close(self):
+        """
+        Releases the workers of the evaluator, if there is one
+        """
+        if self.evaluator is not None:
+            self.evaluator.close()
+            self.evaluator = None
+
     def start_genomes(self, gene_pool: GenePool, conditions: Conditions) -> List[Genome]:
         """
         Creates the starter genomes
@@ -49,10 +80,10 @@ class NeatApplication:
         out_size = self.simulation.get_controls_size()
 
         for in_ in range(1, in_size + 1):
-            gene_pool.node_depths[in_] = conditions.app_start_node_depth
+            gene_pool.set_depth(in_, conditions.app_start_node_depth)
 
         for out_ in range(0, -out_size, -1):
-            gene_pool.node_depths[out_] = conditions.app_end_node_depth
+            gene_pool.set_depth(out_, conditions.app_end_node_depth)
 
         starter_genomes = []
 
@@ -82,46 +113,53 @@ class NeatApplication:
                 print("\tScore\tSize\tAvCon\t\t\tMax\t\tMin")
                 for specie in species:
                     print("\t%0.5f\t%4d\t%.5f  \t%5d\t%5d\t" % (specie.niche_fitness, len(specie.genomes),
-                                                                (sum(list(map(lambda genome: len(genome.genes),
+                                                                (sum(list(map(lambda genome: len(genome.gene_arrays),
                                                                               specie.genomes))) / len(specie.genomes)),
-                                                                max(list(map(lambda genome: len(genome.genes),
+                                                                max(list(map(lambda genome: len(genome.gene_arrays),
                                                                              specie.genomes))),
-                                                                min(list(map(lambda genome: len(genome.genes),
+                                                                min(list(map(lambda genome: len(genome.gene_arrays),
                                                                              specie.genomes)))))
                 for specie_index in range(len(species)):
                     print(" ======== Specie %d ======== " % specie_index)
                     print("Count: %d" % len(species[specie_index].genomes))
                     print("\t%0.5f\t%4d\t%.5f  \t%5d\t%5d\t" % (species[specie_index].niche_fitness,
                                                                 len(species[specie_index].genomes),
-                                                                (sum(list(map(lambda genome: len(genome.genes),
+                                                                (sum(list(map(lambda genome: len(genome.gene_arrays),
                                                                               species[specie_index].genomes))) /
                                                                  len(species[specie_index].genomes)),
-                                                                max(list(map(lambda genome: len(genome.genes),
+                                                                max(list(map(lambda genome: len(genome.gene_arrays),
                                                                              species[specie_index].genomes))),
-                                                                min(list(map(lambda genome: len(genome.genes),
+                                                                min(list(map(lambda genome: len(genome.gene_arrays),
                                                                              species[specie_index].genomes)))))
                     if verbosity > 3:
                         for gene in species[specie_index].representative.genes:
                             print("Gene", gene.in_node, gene.out_node, gene.weight)
 
         self.simulation.restart()
-        self.current_generation.run(self.simulation, self.conditions, batched, batch_size, self.screen, shape)
+        self.current_generation.run(self.simulation, self.conditions, batched, batch_size, self.screen, shape,
+                                    self.fitness_cache, self.evaluator)
         if verbosity > 1:
             print("Sum Genes",
-                  sum(list(map(lambda genome: len(genome.genes), self.current_generation.population.get_genomes()))))
+                  sum(list(map(lambda genome: len(genome.gene_arrays), self.current_generation.population.get_genomes()))))
+            print("Phenotype Time: %.4fs" % self.current_generation.population.phenotype_time)
+            if self.fitness_cache is not None:
+                print("Fitness Cache Hits: %d Misses: %d" % (self.fitness_cache.hits, self.fitness_cache.misses))
+            if isinstance(self.evaluator, WorkerPool) and self.evaluator.stats:
+                stats = self.evaluator.stats
+                print("Worker Pool Sent: %d Carried: %d Bytes: %d Schedule Time: %.4fs Wait Time: %.4fs" % (
+                    stats["sent"], stats["carried"], stats["bytes"], stats["schedule_time"], stats["wait_time"]))
             print("New Connections:", self.conditions.new_connection_count)
             print("New Nodes:", self.conditions.new_node_count)
 
             self.conditions.new_connection_count = 0
             self.conditions.new_node_count = 0
             print("Max Genes",
-                  max(list(map(lambda genome: len(genome.genes), self.current_generation.population.get_genomes()))))
+                  max(list(map(lambda genome: len(genome.gene_arrays), self.current_generation.population.get_genomes()))))
             print("Min Genes",
-                  min(list(map(lambda genome: len(genome.genes), self.current_generation.population.get_genomes()))))
+                  min(list(map(lambda genome: len(genome.gene_arrays), self.current_generation.population.get_genomes()))))
         if verbosity > 0:
             print(self.current_generation.get_score(self.conditions),
-                  sum(list(map(lambda genome: genome.raw_fitness,
-                               self.current_generation.population.get_genomes()))) / self.conditions.population_size)
+                  self.current_generation.population.get_fitnesses().sum() / self.conditions.population_size)
 
             print(self.current_generation.get_score(self.conditions))
             print(self.current_generation.get_best().raw_fitness)
@@ -129,8 +167,7 @@ class NeatApplication:
             LOG_FILE.write("%d,%f,%f,%f\n" % (self.current_generation.generation,
                                               self.current_generation.get_best().raw_fitness,
                                               self.current_generation.get_score(self.conditions),
-                                              sum(list(map(lambda genome: genome.raw_fitness,
-                                                           self.current_generation.population.get_genomes()))) /
+                                              self.current_generation.population.get_fitnesses().sum() /
                                               self.conditions.population_size))
             LOG_FILE.close()
 
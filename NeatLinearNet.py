@@ -5,7 +5,7 @@ import math
 import pygame
 import Net
 from formulas import sigmoid_neat, randomize, color_formula, \
-    color_formula_line_helper, draw_circle, draw_line_helper, encode_list, decode_list, to_bool
+    color_formula_line_helper, draw_circle, draw_line_helper, encode_list, decode_list, to_bool, sparse_dot
 
 
 class NeatLinearNet(Net.Net):
@@ -17,7 +17,11 @@ class NeatLinearNet(Net.Net):
                  enabled_weights: numpy.array = None,
                  activation: Callable = sigmoid_neat,
                  color_formula_param: Callable = color_formula,
-                 weights: numpy.array = None):
+                 weights: numpy.array = None,
+                 layered: bool = True,
+                 sparse_fill_ratio: float = 0.02,
+                 sparse_weights: Tuple[numpy.array, numpy.array, numpy.array] = None,
+                 effective: bool = False):
         super(NeatLinearNet, self).__init__(in_dem, out_dem, activation, lambda x: x, color_formula_param)
         self.middle_dem: int = middle_dem
 
@@ -28,23 +32,241 @@ class NeatLinearNet(Net.Net):
         self.node_sum = numpy.zeros((1, self.middle_dem + self.out_dem))
         self.node_back = numpy.zeros((1, self.in_dem + self.middle_dem))
 
+        self.sparse_fill_ratio: float = sparse_fill_ratio
+        self.effective_weights: numpy.array = None
+        self.row_pointers: numpy.array = None
+        self.column_indices: numpy.array = None
+        self.row_weights: numpy.array = None
+
         # print("LINEAR NET 1:", weights.shape, enabled_weights.shape)
         # print("LINEAR NET 2:", self.in_dem, self.middle_dem, self.out_dem)
         # print("LINEAR NET 3:", self.node_values.shape, self.node_sum.shape, self.node_back.shape)
-        if weights is not None:
+        if sparse_weights is not None:
+            self.weights: numpy.array = None
+            self.enabled_weights: numpy.array = None
+            if effective:
+                self.row_pointers, self.column_indices, self.row_weights = sparse_weights
+                for array in sparse_weights:
+                    array.flags.writeable = False
+            else:
+                self.set_sparse_weights(*sparse_weights)
+        elif effective:
+            # The weights are already masked, so they are used as they are, without an enabled matrix
             self.weights = weights
+            self.enabled_weights = None
+            self.effective_weights = weights
+            self.effective_weights.flags.writeable = False
         else:
-            dif = abs(weight_range[0] - weight_range[1])
-            self.weights = randomize(numpy.zeros((self.in_dem + self.middle_dem, self.middle_dem + self.out_dem)))
-            self.weights = numpy.add(weight_range[1], numpy.multiply(dif, self.weights))
-
-        if enabled_weights is not None:
-            self.enabled_weights: numpy.array = enabled_weights
+            if weights is not None:
+                self.weights = weights
+            else:
+                dif = abs(weight_range[0] - weight_range[1])
+                self.weights = randomize(numpy.zeros((self.in_dem + self.middle_dem, self.middle_dem + self.out_dem)))
+                self.weights = numpy.add(weight_range[1], numpy.multiply(dif, self.weights))
+
+            if enabled_weights is not None:
+                self.enabled_weights: numpy.array = enabled_weights
+            else:
+                self.enabled_weights: numpy.array = numpy.array([
+                    [in_node < out_node
+                     for out_node in range(self.in_dem, self.in_dem + self.middle_dem + self.out_dem)]
+                    for in_node in range(self.in_dem + self.middle_dem)])
+            self.build_effective_weights()
+
+        self.layered: bool = layered
+        self.levels: List[numpy.array] = self.find_runs() if effective else self.find_levels()
+        self.stage_weights: list = self.build_stage_weights()
+
+    def build_effective_weights(self):
+        """
+        Builds the weights the network is evaluated with from the dense weight and enabled matrices,
+        once for the life of the network
+        Disabled and backward connections are masked out of the effective weights
+        The effective weights are kept as a read only dense matrix,
+        or as compressed sparse rows when less than the sparse fill ratio of the matrix is filled
+        """
+        forward_mask = numpy.ones((self.in_dem + self.middle_dem, self.middle_dem + self.out_dem), dtype=bool)
+        forward_mask[self.in_dem:, :self.middle_dem] = numpy.triu(
+            numpy.ones((self.middle_dem, self.middle_dem), dtype=bool), 1)
+        effective_weights = numpy.where(numpy.logical_and(self.enabled_weights, forward_mask), self.weights, 0.0)
+        if numpy.count_nonzero(effective_weights) < self.sparse_fill_ratio * effective_weights.size:
+            rows, columns = numpy.nonzero(effective_weights)
+            self.set_sparse_weights(numpy.searchsorted(rows, numpy.arange(effective_weights.shape[0] + 1)),
+                                    columns, effective_weights[rows, columns])
+        else:
+            self.effective_weights = effective_weights
+            self.effective_weights.flags.writeable = False
+
+    def set_sparse_weights(self, row_pointers: numpy.array, column_indices: numpy.array, row_weights: numpy.array):
+        """
+        Sets the effective weights from compressed sparse rows, without building any dense matrix
+        Backward connections between hidden nodes are dropped
+        :param row_pointers: The start of each row in the column indices and row weights, and the end of the last row
+        :param column_indices: The column of each connection, sorted within each row
+        :param row_weights: The weight of each connection
+        """
+        rows = numpy.repeat(numpy.arange(self.in_dem + self.middle_dem), numpy.diff(row_pointers))
+        forward = numpy.logical_or(column_indices >= self.middle_dem, rows - self.in_dem < column_indices)
+        self.row_pointers = numpy.searchsorted(rows[forward], numpy.arange(self.in_dem + self.middle_dem + 1))
+        self.column_indices = numpy.asarray(column_indices)[forward]
+        self.row_weights = numpy.asarray(row_weights, dtype=float)[forward]
+        self.row_pointers.flags.writeable = False
+        self.column_indices.flags.writeable = False
+        self.row_weights.flags.writeable = False
+
+    def get_edges(self) -> Tuple[numpy.array, numpy.array, numpy.array]:
+        """
+        Gets the effective connections of the network as a list of edges
+        :return: A tuple of the row, the column and the weight of every connection
+        """
+        if self.effective_weights is not None:
+            rows, columns = numpy.nonzero(self.effective_weights)
+            return rows, columns, self.effective_weights[rows, columns]
+        else:
+            rows = numpy.repeat(numpy.arange(self.in_dem + self.middle_dem), numpy.diff(self.row_pointers))
+            return rows, self.column_indices, self.row_weights
+
+    def get_structure_key(self) -> Tuple[int, bytes, bytes]:
+        """
+        Gets a key describing which effective connections the network has, but not their weights
+        Networks with the same key have the same shape and the same levels, so they can be evaluated together
+        :return: A hashable tuple of the number of hidden nodes, and the rows and columns of every connection
+        """
+        rows, columns, weights = self.get_edges()
+        return self.middle_dem, numpy.asarray(rows, dtype=numpy.int64).tobytes(), \
+            numpy.asarray(columns, dtype=numpy.int64).tobytes()
+
+    def find_levels(self) -> List[numpy.array]:
+        """
+        Groups the hidden nodes into dependency levels, using the depth ordering of the weight matrix
+        A hidden node is placed one level after the deepest earlier hidden node connected to it,
+        so the nodes in a level never depend on each other
+        :return: A list of arrays of hidden node indices, one array for each level in evaluation order
+        """
+        rows, columns, weights = self.get_edges()
+        hidden = numpy.logical_and(rows >= self.in_dem, columns < self.middle_dem)
+        order = numpy.argsort(columns[hidden], kind='stable')
+        sources = (rows[hidden] - self.in_dem)[order]
+        bounds = numpy.searchsorted(columns[hidden][order], numpy.arange(self.middle_dem + 1))
+        node_levels = numpy.zeros(self.middle_dem, dtype=int)
+        for i in range(self.middle_dem):
+            if bounds[i] < bounds[i + 1]:
+                node_levels[i] = node_levels[sources[bounds[i]:bounds[i + 1]]].max() + 1
+        return [numpy.flatnonzero(node_levels == level) for level in range(node_levels.max(initial=-1) + 1)]
+
+    def find_runs(self) -> List[numpy.array]:
+        """
+        Groups the hidden nodes into runs of consecutive nodes, a node starts a new run
+        when it is connected to a node of the current run, so the nodes in a run never depend on each other
+        There can be more runs than levels, but the rows of every run are a slice of the weights
+        :return: A list of arrays of hidden node indices, one array for each run in evaluation order
+        """
+        if self.middle_dem == 0:
+            return []
+        rows, columns, weights = self.get_edges()
+        hidden = numpy.logical_and(rows >= self.in_dem, columns < self.middle_dem)
+        last_source = numpy.full(self.middle_dem, -1)
+        numpy.maximum.at(last_source, columns[hidden], rows[hidden] - self.in_dem)
+        starts = [0]
+        for i in range(1, self.middle_dem):
+            if last_source[i] >= starts[-1]:
+                starts.append(i)
+        bounds = starts + [self.middle_dem]
+        return [numpy.arange(bounds[i], bounds[i + 1]) for i in range(len(starts))]
+
+    def build_stage_weights(self) -> list:
+        """
+        Splits the effective weights into one block of rows for the inputs and one for each level of hidden nodes
+        Dense blocks are read only matrices, sparse blocks are tuples of edge rows, columns and weights
+        The blocks of consecutive rows are views of the effective weights, the others are copies
+        :return: A list of weight blocks, in evaluation order
+        """
+        stage_rows = [numpy.arange(self.in_dem)] + [numpy.add(self.in_dem, level) for level in self.levels]
+        stage_weights = []
+        for rows in stage_rows:
+            if len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows):
+                start, stop = rows[0], rows[-1] + 1
+                if self.effective_weights is not None:
+                    stage_weights.append(self.effective_weights[start:stop])
+                else:
+                    first, last = self.row_pointers[start], self.row_pointers[stop]
+                    local_rows = numpy.repeat(numpy.arange(stop - start),
+                                              numpy.diff(self.row_pointers[start:stop + 1]))
+                    stage_weights.append((local_rows, self.column_indices[first:last], self.row_weights[first:last]))
+            elif self.effective_weights is not None:
+                block = self.effective_weights[rows]
+                block.flags.writeable = False
+                stage_weights.append(block)
+            else:
+                starts = self.row_pointers[rows]
+                counts = self.row_pointers[rows + 1] - starts
+                local_rows = numpy.repeat(numpy.arange(len(rows)), counts)
+                edges = numpy.repeat(starts - numpy.cumsum(counts) + counts, counts) + numpy.arange(counts.sum())
+                stage_weights.append((local_rows, self.column_indices[edges], self.row_weights[edges]))
+        return stage_weights
+
+    def stage_product(self, values: numpy.array, stage: int) -> numpy.array:
+        """
+        Multiplies the values of the nodes in a stage by the weights of the stage
+        :param values: A (samples, nodes in stage) matrix of node values
+        :param stage: The index of the stage, 0 for the inputs, then one for each level
+        :return: A (samples, middle + out) matrix of node sums
+        """
+        if self.effective_weights is not None:
+            return numpy.dot(values, self.stage_weights[stage])
+        else:
+            rows, columns, weights = self.stage_weights[stage]
+            return sparse_dot(values, rows, columns, weights, self.middle_dem + self.out_dem)
+
+    def get_effective_weights(self) -> numpy.array:
+        """
+        Gets the effective weights as a dense matrix, expanding the compressed sparse rows if needed
+        :return: A (in + middle, middle + out) matrix of the weights the network is evaluated with
+        """
+        if self.effective_weights is not None:
+            return self.effective_weights
+        else:
+            rows, columns, weights = self.get_edges()
+            dense_weights = numpy.zeros((self.in_dem + self.middle_dem, self.middle_dem + self.out_dem))
+            dense_weights[rows, columns] = weights
+            return dense_weights
+
+    def get_weights(self) -> numpy.array:
+        """
+        Gets the weight matrix, built from the effective weights if the network was built from sparse weights
+        :return: A (in + middle, middle + out) matrix of weights
+        """
+        if self.weights is not None:
+            return self.weights
         else:
-            self.enabled_weights: numpy.array = numpy.array([
-                [in_node < out_node
-                 for out_node in range(self.in_dem, self.in_dem + self.middle_dem + self.out_dem)]
-                for in_node in range(self.in_dem + self.middle_dem)])
+            return self.get_effective_weights()
+
+    def get_enabled_weights(self) -> numpy.array:
+        """
+        Gets the enabled matrix, built from the effective weights if the network was built from sparse weights
+        :return: A (in + middle, middle + out) matrix showing which connections exist
+        """
+        if self.enabled_weights is not None:
+            return self.enabled_weights
+        else:
+            rows, columns, weights = self.get_edges()
+            enabled_weights = numpy.zeros((self.in_dem + self.middle_dem, self.middle_dem + self.out_dem), dtype=bool)
+            enabled_weights[rows, columns] = True
+            return enabled_weights
+
+    def get_row(self, row: int) -> numpy.array:
+        """
+        Gets one row of the effective weights as a dense array
+        :param row: The index of the row
+        :return: A (1, middle + out) array of the weights leaving the row's node
+        """
+        if self.effective_weights is not None:
+            return self.effective_weights[row:row + 1]
+        else:
+            dense_row = numpy.zeros((1, self.middle_dem + self.out_dem))
+            start, end = self.row_pointers[row], self.row_pointers[row + 1]
+            dense_row[0, self.column_indices[start:end]] = self.row_weights[start:end]
+            return dense_row
 
     def update(self, screen: pygame.Surface, x: int, y: int, width: int, height: int, scale_dot: int = 5):
 
@@ -104,13 +326,13 @@ class NeatLinearNet(Net.Net):
         self.in_color_range = list(map(self.color_formula, self.input_nodes[0]))
         self.middle_color_range = list(map(self.color_formula, self.node_values[0][:self.middle_dem]))
         self.out_color_range = list(map(self.color_formula, self.node_values[0][self.middle_dem:]))
-        self.line_color_range = list(map(color_formula_line_helper, self.weights))
+        self.line_color_range = list(map(color_formula_line_helper, self.get_weights()))
 
     def draw(self):
         self.update_colors()
 
         list(map(draw_line_helper, self.line_screen_range, self.line_color_range,
-                 self.line_start_loc, self.line_end_loc, self.line_radius_range, self.enabled_weights))
+                 self.line_start_loc, self.line_end_loc, self.line_radius_range, self.get_enabled_weights()))
 
         any(map(draw_circle, self.in_screen_range, self.in_color_range, self.in_range_loc, self.in_radius_range))
 
@@ -127,22 +349,57 @@ class NeatLinearNet(Net.Net):
         self.node_values = numpy.zeros((1, self.middle_dem + self.out_dem))
 
     def get_out(self):
-        # print(self.weights.shape)
-
-        self.weights = numpy.multiply(self.weights, self.enabled_weights)
-        numpy.zeros((1, self.middle_dem + self.out_dem))
-        # print(self.out_dem)
-        # print(self.in_dem)
-        # print(self.weights.shape)
-        self.node_sum = numpy.dot(self.input_nodes, self.weights[:self.in_dem])
+        if self.layered:
+            return self.get_out_layered()
+        else:
+            return self.get_out_sequential()
+
+    def get_out_layered(self):
+        """
+        Evaluates the network one dependency level at a time,
+        each level of hidden nodes is a single matrix product and activation
+        :return: The values of the output nodes
+        """
+        self.node_sum = self.propagate(self.input_nodes)
+        self.node_values = self.activation_function(self.node_sum)
+        return self.node_values[0][self.middle_dem:]
+
+    def run_batch(self, input_batch: numpy.array) -> numpy.array:
+        """
+        Runs the network on many samples at once, all the samples are propagated through the network as one matrix
+        :param input_batch: A (samples, in) array, with the input values of a sample in each row
+        :return: A (samples, out) array, with the output values of a sample in each row
+        """
+        input_batch = numpy.asarray(input_batch, dtype=float)
+        assert input_batch.ndim == 2 and input_batch.shape[1] == self.in_dem
+        return self.activation_function(self.propagate(input_batch)[:, self.middle_dem:])
+
+    def propagate(self, input_batch: numpy.array) -> numpy.array:
+        """
+        Propagates samples through the network one dependency level at a time
+        :param input_batch: A (samples, in) array of input values
+        :return: A (samples, middle + out) array of the sums flowing into every node
+        """
+        node_sum = self.stage_product(input_batch, 0)
+        node_values = numpy.zeros((input_batch.shape[0], self.middle_dem))
+        for stage, level in enumerate(self.levels, 1):
+            node_values[:, level] = self.activation_function(node_sum[:, level])
+            node_sum += self.stage_product(node_values[:, level], stage)
+        return node_sum
+
+    def get_out_sequential(self):
+        """
+        Evaluates the network one hidden node at a time, in depth order
+        :return: The values of the output nodes
+        """
+        self.node_sum = self.stage_product(self.input_nodes, 0)
         # print(self.node_sum)
 
         for i in range(self.middle_dem):
             self.node_values[0][i] = self.activation_function(self.node_sum[0][i])
             # print(self.node_values[0][i])
 
-            self.node_sum = numpy.add(self.node_sum, numpy.multiply(self.node_values[0][i],
-                                                                    self.weights[self.in_dem + i:self.in_dem + i + 1]))
+            self.node_sum += numpy.multiply(self.node_values[0][i], self.get_row(self.in_dem + i))
 
         self.node_values = self.activation_function(self.node_sum)
 
@@ -152,9 +409,9 @@ class NeatLinearNet(Net.Net):
         return self.node_values[0][self.middle_dem:]
 
     def save(self) -> str:
-        weight_save = encode_list(self.weights, str, 0)
-        enable_save = encode_list(self.enabled_weights, str, 0)
-        save_string = "%d|%d|%d|%s|%s" % (self.in_dem - 1, self.out_dem, self.middle_dem, weight_save, enable_save)
+        weight_save = encode_list(self.get_weights(), str, 0)
+        enable_save = encode_list(self.get_enabled_weights(), str, 0)
+        save_string = "%d|%d|%d|%s|%s" % (self.in_dem, self.out_dem, self.middle_dem, weight_save, enable_save)
         return save_string
 
     def load(self, save):
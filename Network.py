@@ -6,7 +6,8 @@ import Simulation
 
 class Network:
     def __init__(self, weight_matrix: np.array, enabled_matrix: np.array, input_size: int, output_size: int,
-                 middle_size: int, cache_size: int = 0, batch_id: int = None):
+                 middle_size: int, cache_size: int = 0, batch_id: int = None,
+                 sparse_weights: Tuple[np.array, np.array, np.array] = None, effective: bool = False):
 
         """
         The Network represents a Neural Network
@@ -17,10 +18,14 @@ class Network:
         :param output_size: The number of output nodes from the network
         :param middle_size: The number of hidden nodes in the network
         :param cache_size: The size, in cache entries, of the cache for saving answers
+        :param sparse_weights: The weights as compressed sparse rows, used instead of the weight and enabled matrices
+        :param effective: If true the weights are effective weights, which are used as they are, without copies,
+            and no enabled matrix is needed
         """
         # print("NETWORK", weight_matrix.shape, enabled_matrix.shape)
         self.neural_net: NeatLinearNet = NeatLinearNet(input_size, output_size, middle_size,
-                                                       weights=weight_matrix, enabled_weights=enabled_matrix)
+                                                       weights=weight_matrix, enabled_weights=enabled_matrix,
+                                                       sparse_weights=sparse_weights, effective=effective)
         self.cache_size: int = cache_size
         self.cache: dict = {}
         self.batch_id: int = batch_id
@@ -48,12 +53,32 @@ class Network:
                 self.cache[input_values] = out
             return out
 
+    def run_batch(self, input_batch: np.array) -> np.array:
+        """
+        Runs the neural network on many inputs at once, propagating them through the network as one matrix
+        The cache is not used
+        :param input_batch: A (samples, input size) array, with the input values of a sample in each row
+        :return: A (samples, output size) array, with the output values of a sample in each row
+        """
+        return self.neural_net.run_batch(input_batch)
+
+    def execute_dataset(self, simulation: Simulation) -> float:
+        """
+        Scores the neural network against the whole dataset of a simulation in one call
+        :param simulation: The simulation to get the dataset and the score from, must have a fixed dataset
+        :return: The score from the simulation
+        """
+        return simulation.score_dataset(self.run_batch(simulation.get_dataset()))
+
     def execute(self, simulation: Simulation):
         """
         Runs a simulation using the using the neural network as the agent
+        Simulations with a fixed dataset are scored against the whole dataset in one call
         :param simulation: The simulation to run, and get the score from
         :return: The score from the simulation
         """
+        if simulation.get_dataset() is not None:
+            return self.execute_dataset(simulation)
         while simulation.get_state(batch_id=self.batch_id) != Simulation.SimulationState.FINISHED:
             input_data = simulation.get_data(batch_id=self.batch_id)
             processed_data = self.run(input_data)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+
+
+class NodeTable:
+    def __init__(self, node_depths: Dict[int, int] = None, capacity: int = 64):
+        """
+        The NodeTable class keeps the depth of every node in a growable array indexed by node number
+        Output nodes have numbers of zero or less, so the array is offset to fit them
+        It also keeps a global rank for every node, its place when every node is sorted by depth then node number,
+        so any set of nodes can be put in depth order by sorting their ranks
+        :param node_depths: A dictionary of the starting depths of nodes
+        :param capacity: The starting size of the arrays
+        """
+        self.offset: int = 0
+        self.depths: np.array = np.zeros(capacity, dtype=np.int64)
+        self.ranks: np.array = np.zeros(capacity, dtype=np.int64)
+        self.known: np.array = np.zeros(capacity, dtype=bool)
+        self.ranks_valid: bool = True
+        if node_depths:
+            for node, depth in node_depths.items():
+                self.set_depth(node, depth)
+
+    def reserve(self, node: int):
+        """
+        Grows the arrays so they have a slot for the node
+        :param node: The node which needs a slot
+        """
+        if node + self.offset < 0:
+            extra = max(-(node + self.offset), len(self.depths))
+            self.depths = np.concatenate([np.zeros(extra, dtype=np.int64), self.depths])
+            self.ranks = np.concatenate([np.zeros(extra, dtype=np.int64), self.ranks])
+            self.known = np.concatenate([np.zeros(extra, dtype=bool), self.known])
+            self.offset += extra
+        if node + self.offset >= len(self.depths):
+            extra = max(node + self.offset + 1 - len(self.depths), len(self.depths))
+            self.depths = np.concatenate([self.depths, np.zeros(extra, dtype=np.int64)])
+            self.ranks = np.concatenate([self.ranks, np.zeros(extra, dtype=np.int64)])
+            self.known = np.concatenate([self.known, np.zeros(extra, dtype=bool)])
+
+    def set_depth(self, node: int, depth: int):
+        """
+        Sets the depth of a node, the ranks are rebuilt the next time they are used
+        :param node: The node to set the depth of
+        :param depth: The depth of the node
+        """
+        self.reserve(node)
+        self.depths[node + self.offset] = depth
+        self.known[node + self.offset] = True
+        self.ranks_valid = False
+
+    def add_node(self, node: int, depth: int):
+        """
+        Adds a node with a higher number than every known node, updating the ranks in place
+        The new node comes after every node with the same or a lower depth, and before every deeper node
+        :param node: The new node, with a higher number than every known node
+        :param depth: The depth of the new node
+        """
+        if not self.ranks_valid:
+            self.set_depth(node, depth)
+            return
+        self.reserve(node)
+        deeper = np.logical_and(self.known, self.depths > depth)
+        self.ranks[deeper] += 1
+        self.ranks[node + self.offset] = np.count_nonzero(self.known) - np.count_nonzero(deeper)
+        self.depths[node + self.offset] = depth
+        self.known[node + self.offset] = True
+
+    def get_depth(self, node: int) -> int:
+        """
+        Gets the depth of a node
+        :param node: The node to get the depth of
+        :return: The depth of the node
+        """
+        index = node + self.offset
+        if index < 0 or index >= len(self.depths) or not self.known[index]:
+            raise KeyError(node)
+        return int(self.depths[index])
+
+    def get_depths(self, nodes: np.array) -> np.array:
+        """
+        Gets the depths of many nodes
+        :param nodes: The nodes to get the depths of
+        :return: The depths of the nodes
+        """
+        return self.depths[np.asarray(nodes, dtype=np.int64) + self.offset]
+
+    def get_ranks(self, nodes: np.array) -> np.array:
+        """
+        Gets the global ranks of many nodes, sorting nodes by rank sorts them by depth then node number
+        :param nodes: The nodes to get the ranks of
+        :return: The ranks of the nodes
+        """
+        if not self.ranks_valid:
+            known = np.flatnonzero(self.known)
+            self.ranks[known[np.lexsort((known, self.depths[known]))]] = np.arange(len(known))
+            self.ranks_valid = True
+        return self.ranks[np.asarray(nodes, dtype=np.int64) + self.offset]
+
+    def to_dict(self) -> Dict[int, int]:
+        """
+        Gets the depths of the known nodes as a dictionary
+        :return: A dictionary from each known node to its depth
+        """
+        known = np.flatnonzero(self.known)
+        return dict(zip((known - self.offset).tolist(), self.depths[known].tolist()))
@@ -0,0 +1,94 @@
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+from Network import Network
+
+# The layout of one network in the arena: whether its weights are dense, its number of middle nodes,
+# the offset of its weights in floats, the offset of its row pointers and column indices in ints,
+# and its number of connections if its weights are sparse
+Layout = Tuple[bool, int, int, int, int]
+
+
+class PhenotypeArena:
+    def __init__(self, networks: List[Network], input_size: int, output_size: int):
+        """
+        The PhenotypeArena packs the effective weights of many networks into one block of shared memory,
+        so worker processes can rebuild the networks from the block without anything but offsets being sent to them
+        Dense networks are packed as their effective weight matrix,
+        sparse networks as the row pointers, column indices and weights of their compressed sparse rows
+        All the weights are packed first as floats, then all the row pointers and column indices as ints
+        :param networks: The networks to pack
+        :param input_size: The number of input nodes of every network
+        :param output_size: The number of output nodes of every network
+        """
+        self.input_size: int = input_size
+        self.output_size: int = output_size
+        self.layouts: List[Layout] = []
+        float_count = 0
+        int_count = 0
+        for network in networks:
+            neural_net = network.neural_net
+            if neural_net.effective_weights is not None:
+                self.layouts.append((True, neural_net.middle_dem, float_count, int_count, 0))
+                float_count += neural_net.effective_weights.size
+            else:
+                edge_count = len(neural_net.column_indices)
+                self.layouts.append((False, neural_net.middle_dem, float_count, int_count, edge_count))
+                float_count += edge_count
+                int_count += len(neural_net.row_pointers) + edge_count
+
+        self.float_count: int = float_count
+        self.memory: shared_memory.SharedMemory = shared_memory.SharedMemory(
+            create=True, size=max(1, (float_count + int_count) * 8))
+        self.name: str = self.memory.name
+
+        floats = np.ndarray((float_count,), dtype=float, buffer=self.memory.buf)
+        ints = np.ndarray((int_count,), dtype=np.int64, buffer=self.memory.buf, offset=float_count * 8)
+        for network, (dense, middle_size, float_offset, int_offset, edge_count) in zip(networks, self.layouts):
+            neural_net = network.neural_net
+            if dense:
+                floats[float_offset:float_offset + neural_net.effective_weights.size] = \
+                    neural_net.effective_weights.ravel()
+            else:
+                row_count = len(neural_net.row_pointers)
+                floats[float_offset:float_offset + edge_count] = neural_net.row_weights
+                ints[int_offset:int_offset + row_count] = neural_net.row_pointers
+                ints[int_offset + row_count:int_offset + row_count + edge_count] = neural_net.column_indices
+        del floats, ints
+
+    @staticmethod
+    def build_network(buffer: memoryview, float_count: int, layout: Layout, input_size: int,
+                      output_size: int) -> Network:
+        """
+        Builds a network from its effective weights in an arena, the weights of the network are read only views
+        of the shared memory, so no weights are copied
+        The network gives the same outputs as the one which was packed, up to rounding, as its hidden nodes
+        are evaluated in runs of consecutive nodes instead of levels
+        :param buffer: The shared memory of the arena
+        :param float_count: The number of floats in the arena, where the ints start
+        :param layout: The layout of the network in the arena
+        :param input_size: The number of input nodes
+        :param output_size: The number of output nodes
+        :return: The network
+        """
+        dense, middle_size, float_offset, int_offset, edge_count = layout
+        shape = (input_size + middle_size, middle_size + output_size)
+        if dense:
+            weights = np.ndarray(shape, dtype=float, buffer=buffer, offset=float_offset * 8)
+            return Network(weights, None, input_size, output_size, middle_size, effective=True)
+        int_start = (float_count + int_offset) * 8
+        row_pointers = np.ndarray((shape[0] + 1,), dtype=np.int64, buffer=buffer, offset=int_start)
+        column_indices = np.ndarray((edge_count,), dtype=np.int64, buffer=buffer,
+                                    offset=int_start + (shape[0] + 1) * 8)
+        weights = np.ndarray((edge_count,), dtype=float, buffer=buffer, offset=float_offset * 8)
+        return Network(None, None, input_size, output_size, middle_size,
+                       sparse_weights=(row_pointers, column_indices, weights), effective=True)
+
+    def close(self):
+        """
+        Frees the shared memory of the arena, once every worker is done with it
+        """
+        self.memory.close()
+        self.memory.unlink()
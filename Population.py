@@ -2,16 +2,23 @@ from __future__ import annotations
 
 import math
 import random
+import time
 from typing import List
 
+import numpy as np
 import pygame
 
 import formulas
+from BatchNetwork import BatchNetwork
 from Conditions import Conditions
+from Evaluator import Evaluator
+from FitnessCache import FitnessCache
 from GenePool import GenePool
 from Genome import Genome
 from Simulation import Simulation, SimulationState
 from Specie import Specie
+from compatibility import compatibility_matrix
+from processing_genes import compile_networks
 from functions import surround_tag, remove_tag, divide_whole
 
 
@@ -20,11 +27,16 @@ class Population:
         """
         Population is a class which represents all of the genomes in the generation
         All of these genomes are collected into species
+        The population keeps an index of its genomes, with their fitnesses in one array,
+        which is rebuilt the next time it is used after genomes or species are added or removed
         :param species: The species in the population
         """
         self.species: List[Specie] = species
         self.age: int = age
         self.max_fitness: float = max_fitness
+        self.phenotype_time: float = 0.0
+        self.genome_index: List[Genome] = None
+        self.fitnesses: np.array = None
 
     def next(self, conditions: Conditions, gene_pool: GenePool) -> Population:
         """
@@ -76,6 +88,7 @@ class Population:
         if not added:
             specie = Specie(genome, [genome])
             self.add(specie)
+        self.invalidate_index()
 
     def add(self, species: Specie):
         """
@@ -83,41 +96,58 @@ class Population:
         :param species: The species to add
         """
         self.species.append(species)
+        self.invalidate_index()
 
     def run(self, simulation: Simulation, conditions: Conditions, batched: bool = False, batch_size: int = None,
-            screen: pygame.Surface = None, shape=None, delay=1000):
+            screen: pygame.Surface = None, shape=None, delay=1000, fitness_cache: FitnessCache = None,
+            evaluator: Evaluator = None):
         """
         Runs a simulation on every member of the population
+        With a fitness cache, genomes whose fitness is already known are not run,
+        and genomes with the same content are only run once
         :param screen:
         :param batched: If false run sim separately on each genome, if true run them as groups
         :param batch_size: The size of the batches to run, if None, then the batch will be the size of all the genomes
         :param simulation: The simulation to run
         :param conditions: The conditions to use when running the simulation
+        :param fitness_cache: The cache of known fitnesses, only to be used with deterministic simulations
+        :param evaluator: The evaluator which runs the genomes when not batched, None to run them one at a time
         """
         if shape and screen:
             print(screen, shape)
+        genomes = self.get_genomes()
+        pending = list(range(len(genomes)))
+        if fitness_cache is not None:
+            keys = [fitness_cache.key(genome) for genome in genomes]
+            pending, duplicates, pending_keys = [], [], set()
+            for i in range(len(genomes)):
+                if keys[i] in pending_keys:
+                    duplicates.append(i)
+                    continue
+                fitness = fitness_cache.get(keys[i])
+                if fitness is None:
+                    pending.append(i)
+                    pending_keys.add(keys[i])
+                else:
+                    genomes[i].set_fitness(fitness)
+
         if batched:
-            genomes = self.get_genomes()
             batches = []
             if batch_size:
                 assert batch_size == simulation.batch_size
-                for batch_start in range(0, len(genomes), batch_size):
-                    batches.append(genomes[batch_start:min(batch_start + batch_size, len(genomes) + 1)])
-            else:
+                for batch_start in range(0, len(pending), batch_size):
+                    batches.append([genomes[i] for i in pending[batch_start:batch_start + batch_size]])
+            elif len(pending) > 0:
                 assert len(genomes) == simulation.batch_size
-                batches.append(genomes)
+                batches.append([genomes[i] for i in pending])
 
             for batch in batches:
+                batch_network = BatchNetwork(list(map(lambda genome: genome.network, batch)),
+                                             simulation.get_data_size(), simulation.get_controls_size(),
+                                             simulation.batch_size)
                 while any([state != SimulationState.FINISHED for state in simulation.get_state_batch()]):
                     data = simulation.get_data_batch()
-                    controls = []
-                    for i in range(simulation.batch_size):
-                        if i < len(batch):
-                            control = batch[i].network.run(data[i])
-                            assert len(control) == simulation.get_controls_size()
-                            controls.append(control)
-                        else:
-                            controls.append([0.0] * simulation.get_controls_size())
+                    controls = batch_network.run(data)
                     if screen and shape:
                         self.draw_population(screen, shape)
                     simulation.apply_controls_batch(controls)#, screen=screen, shape=shape)
@@ -125,14 +155,27 @@ class Population:
                 for i in range(len(batch)):
                     batch[i].set_fitness(scores[i])
 
-            for specie in self.species:
-                specie.update_fitness(conditions)
+        elif evaluator is not None:
+            fitnesses = evaluator.evaluate([genomes[i] for i in pending], pending)
+            for i, fitness in zip(pending, fitnesses):
+                genomes[i].set_fitness(fitness)
 
         else:
-            batch_id = 0
-            for specie in self.species:
-                specie.run(simulation, conditions, first_batch_id=batch_id)
-                batch_id += len(specie.genomes)
+            # Restarted before every genome, as the evaluators do, so the fitnesses are the same
+            for i in pending:
+                simulation.restart()
+                genomes[i].run(simulation, batch_id=i)
+
+        if fitness_cache is not None:
+            fitnesses = {}
+            for i in pending:
+                fitness_cache.put(keys[i], genomes[i].raw_fitness)
+                fitnesses[keys[i]] = genomes[i].raw_fitness
+            for i in duplicates:
+                genomes[i].set_fitness(fitnesses[keys[i]])
+
+        for specie in self.species:
+            specie.update_fitness(conditions)
         self.update_fitness(conditions)
         if shape and screen:
             pygame.time.delay(delay)
@@ -147,9 +190,13 @@ class Population:
         self.species.sort(key=lambda specie: specie.niche_fitness)
         if len(self.species) > 1:
             genomes = self.species[0].genomes + self.species[1].genomes
+            fitnesses = np.concatenate([self.species[0].get_fitnesses(), self.species[1].get_fitnesses()])
         else:
             genomes = self.species[0].genomes
-        genomes.sort()
+            fitnesses = self.species[0].get_fitnesses()
+        self.invalidate_index()
+        # Every parent is used, so they are put in order of fitness by one stable sort of the fitnesses
+        genomes = [genomes[i] for i in np.argsort(fitnesses, kind='stable')]
         new_genomes = []
         for i in range(conditions.population_size):
             father_genome = genomes[i % len(genomes)]
@@ -160,14 +207,47 @@ class Population:
         new_population.clear_empty_species()
         return new_population
 
-    def add_all_genomes(self, genomes: List[Genome], conditions: Conditions):
+    def add_all_genomes(self, genomes: List[Genome], conditions: Conditions, new_species_block: int = 64):
         """
         Adds all genomes from a list to the first appropriate species
+        The genomes end up in the same species as when added one at a time with add_genome,
+        but the compatibility distances are found in bulk
         :param genomes: A list of genomes to add to the population
         :param conditions: The conditions to use when reproducing
+        :param new_species_block: The number of genomes which are compared as possible new species at once
         """
-        for genome in genomes:
-            self.add_genome(genome, conditions)
+        gene_arrays = [genome.gene_arrays for genome in genomes]
+        distances = compatibility_matrix([specie.representative.gene_arrays for specie in self.species],
+                                         gene_arrays, conditions)
+        matches = distances < conditions.species_threshold
+        unmatched = []
+        for i in range(len(genomes)):
+            if matches[:, i].any():
+                self.species[int(matches[:, i].argmax())].genomes.append(genomes[i])
+            else:
+                unmatched.append(i)
+
+        # A genome which matches no species starts a new one, which every later unmatched genome is compared to
+        # The distances are found for a block of possible new species at a time,
+        # then each new species takes all of the later unmatched genomes close to it at once
+        later = np.array(unmatched, dtype=np.int64)
+        claimed = np.zeros(len(genomes), dtype=bool)
+        while len(later) > 0:
+            candidates = later[:new_species_block]
+            distances = compatibility_matrix([gene_arrays[i] for i in candidates],
+                                             [gene_arrays[i] for i in later], conditions)
+            for i in range(len(candidates)):
+                if claimed[candidates[i]]:
+                    continue
+                specie = Specie(genomes[candidates[i]], [genomes[candidates[i]]])
+                self.add(specie)
+                close = later[np.logical_and.reduce([later > candidates[i], ~claimed[later],
+                                                     distances[i] < conditions.species_threshold])]
+                claimed[close] = True
+                specie.genomes.extend(genomes[j] for j in close)
+            later = later[len(candidates):]
+            later = later[~claimed[later]]
+        self.invalidate_index()
 
     def get_fertile_genomes(self, conditions: Conditions) -> List[Genome]:
         """
@@ -179,14 +259,64 @@ class Population:
         genomes = [genome for genomes in list_genomes for genome in genomes]
         return genomes
 
+    def compile_networks(self, gene_pool: GenePool) -> float:
+        """
+        Builds the networks of every genome which does not have one yet, all at once
+        :param gene_pool: The GenePool which has data on the depth of nodes
+        :return: The time taken to build the networks in seconds, which is also kept as the phenotype time
+        """
+        start = time.perf_counter()
+        genomes = [genome for genome in self.get_genomes() if genome.cached_network is None]
+        if genomes:
+            networks = compile_networks([genome.gene_arrays for genome in genomes],
+                                        genomes[0].input_size, genomes[0].output_size, gene_pool)
+            for genome, (network, middles) in zip(genomes, networks):
+                genome.cached_network = network
+        self.phenotype_time = time.perf_counter() - start
+        return self.phenotype_time
+
+    def build_index(self):
+        """
+        Builds the index of the genomes of the population, species by species, and the array of their fitnesses
+        Every genome is bound to its slot, so setting its fitness updates the array,
+        and every species gets a view of the fitnesses of its genomes
+        """
+        self.genome_index = [genome for specie in self.species for genome in specie.genomes]
+        self.fitnesses = np.array([genome.raw_fitness for genome in self.genome_index], dtype=float)
+        for slot, genome in enumerate(self.genome_index):
+            genome.bind_fitness(self.fitnesses, slot)
+        start = 0
+        for specie in self.species:
+            specie.fitnesses = self.fitnesses[start:start + len(specie.genomes)]
+            start += len(specie.genomes)
+
+    def invalidate_index(self):
+        """
+        Throws away the index of the genomes, it is rebuilt the next time it is used
+        Must be called after adding or removing genomes or species, or changing the order of the species
+        """
+        self.genome_index = None
+        self.fitnesses = None
+        for specie in self.species:
+            specie.fitnesses = None
+
     def get_genomes(self) -> List[Genome]:
         """
-        Gets all of the genomes in the population
+        Gets all of the genomes in the population, from the index of the genomes
+        The list is shared, it must not be changed
         :return: A list of all the genomes in the population
         """
-        list_genomes = list(map(lambda species: species.genomes, self.species))
-        genomes = [genome for genomes in list_genomes for genome in genomes]
-        return genomes
+        if self.genome_index is None or len(self.genome_index) != sum(len(specie.genomes) for specie in self.species):
+            self.build_index()
+        return self.genome_index
+
+    def get_fitnesses(self) -> np.array:
+        """
+        Gets the fitness of every genome in the population, in the same order as get_genomes
+        :return: An array of the raw fitness of each genome
+        """
+        self.get_genomes()
+        return self.fitnesses
 
     def clear_empty_species(self) -> List[Specie]:
         """
@@ -196,6 +326,7 @@ class Population:
         empty_species = list(filter(lambda specie: len(specie.genomes) == 0, self.species))
         for specie in empty_species:
             self.species.remove(specie)
+        self.invalidate_index()
         return empty_species
 
     def update_fitness(self, conditions:Conditions):
@@ -222,7 +353,7 @@ class Population:
         return save_string
 
     @staticmethod
-    def load(string) -> Population:
+    def load(string, gene_pool: GenePool = None) -> Population:
         age_str, string = remove_tag("age", string)
         max_fitness_str, string = remove_tag("max_fitness", string)
         species_str, string = remove_tag("species", string)
@@ -232,7 +363,7 @@ class Population:
         species = []
         while species_str:
             specie_str, species_str = remove_tag("specie", species_str)
-            specie = Specie.load(specie_str)
+            specie = Specie.load(specie_str, gene_pool)
             species.append(specie)
 
         return Population(species, age, max_fitness)
@@ -0,0 +1,133 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+from Evaluator import Evaluator
+from GeneArrays import GeneArrays
+from GenePool import GenePool
+from Genome import Genome
+from NodeTable import NodeTable
+from PhenotypeArena import PhenotypeArena, Layout
+from Simulation import Simulation
+from processing_genes import build_network
+
+# The simulation of a worker process, set once when the worker starts
+worker_simulation: Simulation = None
+# The shared memory of the last arena a worker process read from, kept open until a new arena is sent
+worker_arena: shared_memory.SharedMemory = None
+
+
+def initialize_worker(simulation: Simulation):
+    """
+    Keeps the copy of the simulation a worker process was started with, for every genome it runs
+    :param simulation: The simulation of the worker
+    """
+    global worker_simulation
+    worker_simulation = simulation
+
+
+def evaluate_chunk(node_table: NodeTable, input_size: int, output_size: int,
+                   genes: List[Tuple[GeneArrays, int]]) -> List[float]:
+    """
+    Runs the simulation of the worker for a chunk of genomes
+    The networks are built from the genes, which gives the same networks as in the main process
+    :param node_table: The depths of the nodes of the genomes
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param genes: The genes and the batch id of each genome
+    :return: The fitness of each genome
+    """
+    gene_pool = GenePool(0, 0, {}, node_table=node_table)
+    fitnesses = []
+    for gene_arrays, batch_id in genes:
+        network, middles = build_network(gene_arrays, input_size, output_size, gene_pool)
+        network.batch_id = batch_id
+        worker_simulation.restart()
+        fitnesses.append(network.execute(worker_simulation))
+    return fitnesses
+
+
+def evaluate_arena_chunk(arena_name: str, float_count: int, input_size: int, output_size: int,
+                         layouts: List[Tuple[Layout, int]]) -> List[float]:
+    """
+    Runs the simulation of the worker for a chunk of genomes whose networks are packed in an arena
+    Only the name of the arena and the layouts are sent, the weights are read straight out of the shared memory
+    :param arena_name: The name of the shared memory of the arena
+    :param float_count: The number of floats in the arena
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param layouts: The layout in the arena and the batch id of each genome
+    :return: The fitness of each genome
+    """
+    global worker_arena
+    if worker_arena is None or worker_arena.name != arena_name:
+        if worker_arena is not None:
+            worker_arena.close()
+        worker_arena = shared_memory.SharedMemory(name=arena_name)
+    fitnesses = []
+    for layout, batch_id in layouts:
+        network = PhenotypeArena.build_network(worker_arena.buf, float_count, layout, input_size, output_size)
+        network.batch_id = batch_id
+        worker_simulation.restart()
+        fitnesses.append(network.execute(worker_simulation))
+    return fitnesses
+
+
+class ProcessEvaluator(Evaluator):
+    def __init__(self, simulation: Simulation, workers: int = None, chunks_per_worker: int = 4,
+                 shared_memory_arena: bool = False):
+        """
+        The ProcessEvaluator runs genomes on a pool of worker processes, which last until it is closed
+        Every worker keeps its own copy of the simulation, which is restarted before each genome,
+        so the fitnesses are the same as running the genomes one at a time, for simulations where the score of
+        a genome does not depend on the genomes run before it and no random numbers are drawn
+        Only the genes are sent to the workers, the simulation must be picklable, so it can not have a screen
+        With a shared memory arena, the networks of the genomes are packed into a PhenotypeArena instead,
+        and only their offsets are sent, so the cost of sending a genome does not grow with its size
+        :param simulation: The simulation to copy into every worker
+        :param workers: The number of worker processes, None for one per core
+        :param chunks_per_worker: The number of chunks the genomes are split into for each worker
+        :param shared_memory_arena: If true the networks are sent through a shared memory arena
+        """
+        self.executor: ProcessPoolExecutor = ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker,
+                                                                 initargs=(simulation,))
+        self.workers: int = workers if workers is not None else os.cpu_count()
+        self.chunks_per_worker: int = chunks_per_worker
+        self.shared_memory_arena: bool = shared_memory_arena
+
+    def evaluate(self, genomes: List[Genome], batch_ids: List[int]) -> List[float]:
+        """
+        Runs the simulation for every genome, in chunks spread over the workers
+        :param genomes: The genomes to run
+        :param batch_ids: The batch id of each genome
+        :return: The fitness of each genome
+        """
+        if len(genomes) == 0:
+            return []
+        input_size, output_size = genomes[0].input_size, genomes[0].output_size
+        chunk_size = math.ceil(len(genomes) / (self.workers * self.chunks_per_worker))
+        if self.shared_memory_arena:
+            arena = PhenotypeArena([genome.network for genome in genomes], input_size, output_size)
+            try:
+                layouts = list(zip(arena.layouts, batch_ids))
+                futures = [self.executor.submit(evaluate_arena_chunk, arena.name, arena.float_count,
+                                                input_size, output_size, layouts[start:start + chunk_size])
+                           for start in range(0, len(layouts), chunk_size)]
+                return [fitness for future in futures for fitness in future.result()]
+            finally:
+                arena.close()
+
+        node_table = genomes[0].gene_pool.node_table
+        genes = [(genome.gene_arrays, batch_id) for genome, batch_id in zip(genomes, batch_ids)]
+        futures = [self.executor.submit(evaluate_chunk, node_table, input_size, output_size,
+                                        genes[start:start + chunk_size])
+                   for start in range(0, len(genes), chunk_size)]
+        return [fitness for future in futures for fitness in future.result()]
+
+    def close(self):
+        """
+        Shuts the worker processes down
+        """
+        self.executor.shutdown()
@@ -25,7 +25,8 @@ class Simulation:
                  shape: Tuple[int, int, int, int] = None,
                  screen: pygame.Surface = None,
                  batch_size: int = 1,
-                 verbosity: int = 0):
+                 verbosity: int = 0,
+                 deterministic: bool = False):
         """
         A class for representing a simulation
         :param controls_size: The length of the controls the simulation will use
@@ -35,6 +36,7 @@ class Simulation:
         :param screen: A pygame surface where the Simulation will be displayed
         :param batch_size: The number of agents the simulation can represent in at one time
         :param verbosity: How "verbal" the simulation should be
+        :param deterministic: True if an agent always gets the same score, so known scores can be reused
         """
         self.verbosity = verbosity
         self.controls_size = controls_size
@@ -44,6 +46,7 @@ class Simulation:
         self.screen = screen
         self.time_count = 0
         self.batch_size = batch_size
+        self.deterministic = deterministic
 
     def restart(self):
         """
@@ -136,6 +139,22 @@ class Simulation:
         """
         pass
 
+    def get_dataset(self) -> numpy.array:
+        """
+        Gets every input the simulation passes to an agent, if the simulation is a fixed dataset
+        Simulations where the data depends on the controls of the agent return None
+        :return: A (samples, data size) array with the data for each step in a row, or None
+        """
+        return None
+
+    def score_dataset(self, outputs: numpy.array) -> float:
+        """
+        Scores an agent on the whole dataset at once
+        :param outputs: A (samples, controls size) array with the agent's controls for each row of the dataset
+        :return: The score, the same as the agent would get by running the simulation step by step
+        """
+        raise NotImplementedError("%s does not have a fixed dataset" % type(self).__name__)
+
     def next(self):
         """
         Moves to the next step in the simulation
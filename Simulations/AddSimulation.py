@@ -24,7 +24,8 @@ class AddSimulation(Simulation):
         :param batch_size: The number of agents the simulation can represent in at one time
         :param limit: The limit of the number of times the simulation can be run
         """
-        super().__init__(1, 2, screen is not None and shape is not None, shape, screen, batch_size)
+        super().__init__(1, 2, screen is not None and shape is not None, shape, screen, batch_size,
+                         deterministic=True)
         self.verbosity = verbosity
         self.batch_size = batch_size
         self.score = numpy.array([0.0 for i in range(batch_size)])
@@ -33,6 +34,10 @@ class AddSimulation(Simulation):
         self.completed = [False for i in range(batch_size)]
         self.limit = 2 ** (digits * 2)
         self.digits = digits
+        self.dataset = numpy.array([number_to_digits(number, self.digits * 2) + [1] for number in range(self.limit)])
+        self.targets = numpy.array([number_to_digits(digits_to_number(binary[:self.digits]) +
+                                                     digits_to_number(binary[self.digits:]), self.digits * 2)
+                                    for binary in self.dataset[:, :-1]])
 
     def get_data_size(self) -> int:
         """
@@ -152,6 +157,22 @@ class AddSimulation(Simulation):
         """
         return self.score.copy() / (self.digits * 2 * self.time_count)
 
+    def get_dataset(self) -> numpy.array:
+        """
+        Gets every input the simulation passes to an agent
+        :return: A (samples, data size) array with the data for each step in a row
+        """
+        return self.dataset
+
+    def score_dataset(self, outputs: numpy.array) -> float:
+        """
+        Scores an agent on the whole dataset at once
+        :param outputs: A (samples, controls size) array with the agent's controls for each row of the dataset
+        :return: The score, the same as the agent would get by running the simulation step by step
+        """
+        return float(numpy.sum(1.0 - numpy.square(self.targets - outputs[:, :self.digits * 2])) /
+                     (self.digits * 2 * self.limit))
+
     def next(self):
         # print("\n".join(list(map(lambda row: " ".join(list(map(lambda cell: "%1.0f"%round(cell), row))), self.past[:self.time_count+1]))))
         # print()
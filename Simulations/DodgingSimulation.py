@@ -20,13 +20,17 @@ class DodgingSimulation(Simulation):
                  batch_size: int = 1,
                  verbosity: int = 0,
                  obstacles=1,
-                 delay=0):
+                 delay=0,
+                 seed: int = 0):
         """
         A class for representing a simulation
+        An agent which is run on its own, with its batch id, gets obstacles from a generator seeded with the seed and
+        its batch id, so it meets the same obstacles in every process, batched agents share obstacles from random
         :param shape: The area to display the Simulation on a surface, [x, y, width, height
         :param screen: A pygame surface where the Simulation will be displayed
         :param batch_size: The number of agents the simulation can represent in at one time
         :param verbosity: How "verbal" the simulation should be
+        :param seed: The seed of the obstacles of an agent run on its own
         """
         super().__init__(2,
                          (width * 2 - 1) * depth,
@@ -40,11 +44,16 @@ class DodgingSimulation(Simulation):
         self.depth = depth
         self.obstacles = obstacles
         self.delay = delay
+        self.seed = seed
+        # The generator of the obstacles, made when a single agent is first given controls after a restart
+        self.course: random.Random = None
         self.grid = numpy.zeros((self.width, self.depth))
         self.living = numpy.array([True] * self.batch_size)
         self.scores = numpy.array([0] * self.batch_size)
         self.locations = numpy.array([self.width // 2] * self.batch_size)
         self.moved = numpy.array([False] * self.batch_size)
+        # The agents which have been given controls since the restart, the others are not waited for
+        self.active = numpy.array([False] * self.batch_size)
 
     def restart(self):
         """
@@ -58,6 +67,8 @@ class DodgingSimulation(Simulation):
         self.scores = numpy.array([0] * self.batch_size)
         self.locations = numpy.array([self.width // 2] * self.batch_size)
         self.moved = numpy.array([False] * self.batch_size)
+        self.active = numpy.array([False] * self.batch_size)
+        self.course = None
 
     def get_data_size(self) -> int:
         """
@@ -80,24 +91,30 @@ class DodgingSimulation(Simulation):
         :param batch_id: The ID of the agent if the simulation uses batches
         :param controls: A tuple of floats, representing the controls
         """
+        if batch_id is not None:
+            self.active[batch_id] = True
+            if self.course is None:
+                self.course = random.Random(self.seed * self.batch_size + batch_id)
+        else:
+            self.active[:] = True
         if (controls[0] >= 0.5 and controls[1] >= 0.5) or (controls[0] < 0.5 and controls[1] < 0.5):
-            if batch_id and self.living[batch_id] and not self.moved[batch_id]:
+            if batch_id is not None and self.living[batch_id] and not self.moved[batch_id]:
                 self.moved[batch_id] = True
-            elif not batch_id:
+            elif batch_id is None:
                 self.moved[:] = True
 
         elif controls[0] >= 0.5:
-            if batch_id and self.living[batch_id] and not self.moved[batch_id]:
+            if batch_id is not None and self.living[batch_id] and not self.moved[batch_id]:
                 self.locations[batch_id] -= 1
                 self.moved[batch_id] = True
-            elif not batch_id:
+            elif batch_id is None:
                 self.locations = self.locations - 1 * self.living * ~self.moved
                 self.moved[:] = True
         elif controls[1] >= 0.5:
-            if batch_id and self.living[batch_id]:
+            if batch_id is not None and self.living[batch_id] and not self.moved[batch_id]:
                 self.locations[batch_id] += 1
                 self.moved[batch_id] = True
-            elif not batch_id:
+            elif batch_id is None:
                 self.locations = self.locations + 1 * self.living * ~self.moved
                 self.moved[:] = True
         self.next()
@@ -115,6 +132,7 @@ class DodgingSimulation(Simulation):
         self.locations = self.locations + (~self.moved) * self.living * (
                 right_controls.astype(int) - left_controls.astype(int))
         self.moved = self.moved | self.living & True
+        self.active[:] = True
         self.next()
 
     def get_data(self, batch_id: int = None) -> Tuple[float]:
@@ -170,7 +188,7 @@ class DodgingSimulation(Simulation):
         :param batch_id: The ID of the agent if the simulation uses batches
         :return: The state of the current simulation
         """
-        if batch_id:
+        if batch_id is not None:
             return SimulationState.RUNNING if self.living[batch_id] else SimulationState.FINISHED
         else:
             return SimulationState.RUNNING if any(self.living) else SimulationState.FINISHED
@@ -188,7 +206,7 @@ class DodgingSimulation(Simulation):
         :param batch_id: The ID of the agent if the simulation uses batches
         :return: The score
         """
-        return self.scores[batch_id] if batch_id else self.scores[0]
+        return self.scores[batch_id] if batch_id is not None else self.scores[0]
 
     def get_score_batch(self) -> List[float]:
         """
@@ -199,17 +217,19 @@ class DodgingSimulation(Simulation):
 
     def next(self):
         """
-        Moves to the next step in the simulation
+        Moves to the next step in the simulation, once every living agent which is being run has moved
         """
-        if not any(self.moved != self.living):
+        if not any((self.moved != self.living) & self.active):
             self.time_count += 1
             self.grid[:, :-1] = self.grid[:, 1:]
             self.grid[:, -1] = numpy.zeros((self.width,))
-            self.grid[random.sample(list(range(self.width)), self.obstacles), -1] = 1
+            course = self.course if self.course is not None else random
+            self.grid[course.sample(list(range(self.width)), self.obstacles), -1] = 1
 
             locations = self.locations * (self.locations >= 0) * (self.locations < self.width)
 
-            print(self)
+            if self.verbosity > 0:
+                print(self)
 
             self.living = self.living & \
                           (1 != self.grid[:, 0][locations]) & \
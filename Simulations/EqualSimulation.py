@@ -20,12 +20,14 @@ class EqualSimulation(Simulation):
         :param batch_size: The number of agents the simulation can represent in at one time
         :param limit: The limit of the number of times the simulation can be run
         """
-        super().__init__(1, 2, False, None, None, batch_size)
+        super().__init__(1, 2, False, None, None, batch_size, deterministic=True)
         self.batch_size = batch_size
         self.score = numpy.array([0.0 for i in range(batch_size)])
         self.results = [0 for i in range(batch_size)]
         self.completed = [False for i in range(batch_size)]
         self.limit = limit
+        self.dataset = numpy.array(list(map(get_args, range(self.limit + 1))))
+        self.targets = self.dataset[:, :-1]
 
     def get_data_size(self) -> int:
         """
@@ -126,6 +128,21 @@ class EqualSimulation(Simulation):
         """
         return self.score.copy() / self.time_count
 
+    def get_dataset(self) -> numpy.array:
+        """
+        Gets every input the simulation passes to an agent
+        :return: A (samples, data size) array with the data for each step in a row
+        """
+        return self.dataset
+
+    def score_dataset(self, outputs: numpy.array) -> float:
+        """
+        Scores an agent on the whole dataset at once
+        :param outputs: A (samples, controls size) array with the agent's controls for each row of the dataset
+        :return: The score, the same as the agent would get by running the simulation step by step
+        """
+        return float(numpy.sum(1.0 - numpy.sum(numpy.square(self.targets - outputs), 1) / 4) / (self.limit + 1))
+
     def next(self):
         self.time_count += 1
         self.completed = [False for i in range(self.batch_size)]
@@ -22,13 +22,16 @@ class OrSimulation(Simulation):
         :param batch_size: The number of agents the simulation can represent in at one time
         :param limit: The limit of the number of times the simulation can be run
         """
-        super().__init__(1, 2, screen is not None and shape is not None, shape, screen, batch_size)
+        super().__init__(1, 2, screen is not None and shape is not None, shape, screen, batch_size,
+                         deterministic=True)
         self.batch_size = batch_size
         self.score = numpy.array([0.0 for i in range(batch_size)])
         self.results = [0 for i in range(batch_size)]
         self.past = numpy.zeros((limit, batch_size))
         self.completed = [False for i in range(batch_size)]
         self.limit = limit
+        self.dataset = numpy.array(list(map(get_xor_args, range(self.limit))))
+        self.targets = numpy.array([or_func(inputs[0], inputs[1]) for inputs in self.dataset], dtype=float)
 
     def get_data_size(self) -> int:
         """
@@ -130,6 +133,21 @@ class OrSimulation(Simulation):
         """
         return self.score.copy() / (self.time_count)
 
+    def get_dataset(self) -> numpy.array:
+        """
+        Gets every input the simulation passes to an agent
+        :return: A (samples, data size) array with the data for each step in a row
+        """
+        return self.dataset
+
+    def score_dataset(self, outputs: numpy.array) -> float:
+        """
+        Scores an agent on the whole dataset at once
+        :param outputs: A (samples, controls size) array with the agent's controls for each row of the dataset
+        :return: The score, the same as the agent would get by running the simulation step by step
+        """
+        return float(numpy.sum(1.0 - numpy.square(self.targets - outputs[:, 0])) / self.limit)
+
     def next(self):
         # print("\n".join(list(map(lambda row: " ".join(list(map(lambda cell: "%1.0f"%round(cell), row))), self.past[:self.time_count+1]))))
         # print()
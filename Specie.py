@@ -3,11 +3,13 @@ from __future__ import annotations
 import random
 from typing import List
 
+import numpy as np
+
 from Conditions import Conditions
 from GenePool import GenePool
 from Genome import Genome
 from Simulation import Simulation
-from functions import surround_tag, remove_tag
+from functions import surround_tag, remove_tag, select_top
 
 
 class Specie:
@@ -24,6 +26,25 @@ class Specie:
         self.age = age
         self.max_fitness = max_fitness
         self.niche_fitness = 0
+        self.fitnesses: np.array = None
+
+    def get_fitnesses(self) -> np.array:
+        """
+        Gets the fitness of every genome in the species, in the order of the genomes
+        This is a view of the fitness array of the population when it is up to date, otherwise it is built
+        :return: An array of the raw fitness of each genome
+        """
+        if self.fitnesses is None or len(self.fitnesses) != len(self.genomes):
+            return np.array([genome.raw_fitness for genome in self.genomes], dtype=float)
+        return self.fitnesses
+
+    def select(self, count: int) -> List[Genome]:
+        """
+        Selects the fittest genomes without sorting the whole species
+        :param count: The number of genomes to select
+        :return: The fittest genomes, fittest first, genomes as fit as each other stay in the order of the species
+        """
+        return [self.genomes[i] for i in select_top(self.get_fitnesses(), count)]
 
     def fertile(self, conditions: Conditions) -> bool:
         """
@@ -72,11 +93,7 @@ class Specie:
         :param conditions: The conditions to use to reproduce
         :return: a list of new genomes
         """
-        self.genomes.sort(reverse=True)
-        if len(self.genomes) > round(count * conditions.species_keep_ratio):
-            species_genomes = self.genomes[:round(count * conditions.species_keep_ratio)]
-        else:
-            species_genomes = self.genomes
+        species_genomes = self.select(round(count * conditions.species_keep_ratio))
 
         new_genomes = []
 
@@ -95,7 +112,7 @@ class Specie:
                 new_genome = mother_genome.breed(father_genome, gene_pool, conditions)
             new_genomes.append(new_genome)
         if conditions.species_keep_champion and conditions.species_champion_limit < len(self.genomes):
-            new_genomes.append(max(species_genomes))
+            new_genomes.append(species_genomes[0])
             # print("CHAMPION", (max(species_genomes)))
 
         return new_genomes
@@ -105,16 +122,15 @@ class Specie:
         Trims the genome to a certain size
         :param count: The number of genomes to reduce the size to
         """
-        self.genomes.sort(reverse=True)
-        self.genomes = self.genomes[:min(len(self.genomes), count)]
+        self.genomes = self.select(count)
+        self.fitnesses = None
 
     def get_genomes(self, count: int):
         """
         Returns a list of genomes of the size of the genome or smaller
         :param count: The number of genomes to return
         """
-        self.genomes.sort(reverse=True)
-        return self.genomes[:min(len(self.genomes), count)]
+        return self.select(count)
 
     def run(self, simulation: Simulation, conditions: Conditions, first_batch_id=0):
         """
@@ -161,14 +177,14 @@ class Specie:
         return save_string
 
     @staticmethod
-    def load(string) -> Specie:
+    def load(string, gene_pool: GenePool = None) -> Specie:
         representative_str, string = remove_tag("representative", string)
         age_str, string = remove_tag("age", string)
         niche_fitness_str, string = remove_tag("niche_fitness", string)
         max_fitness_str, string = remove_tag("max_fitness", string)
         genomes_str, string = remove_tag("genomes", string)
 
-        representative = Genome.load(representative_str)
+        representative = Genome.load(representative_str, gene_pool)
         age = int(age_str)
         niche_fitness = float(niche_fitness_str)
         max_fitness = float(max_fitness_str)
@@ -176,7 +192,7 @@ class Specie:
         genomes = []
         while genomes_str:
             genome_str, genomes_str = remove_tag("genome", genomes_str)
-            genome = Genome.load(genome_str)
+            genome = Genome.load(genome_str, gene_pool)
             genomes.append(genome)
         specie = Specie(representative, genomes, age, max_fitness)
         specie.niche_fitness = niche_fitness
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import Gene
+from functions import surround_tag, remove_tag
+
 
 class StructureGene:
     def __init__(self, in_node: int, out_node: int):
@@ -78,19 +80,10 @@ class StructureGene:
 
     def __hash__(self):
         """
-        Uses the structure to produce a hash that is unique for each structure
-        :return: a hash that is unique for each structure
+        Uses the structure to produce a hash, which is the same as the hash of the (in_node, out_node) key
+        :return: a hash of the structure
         """
-        hash_agg = 0
-        shift = 1
-        in_node = self.in_node
-        out_node = self.out_node
-        while in_node > 0 or out_node > 0:
-            hash_agg += shift * (in_node % 10) + shift * 10 * (out_node % 10)
-            in_node = in_node // 10
-            out_node = out_node // 10
-            shift *= 100
-        return hash_agg
+        return hash((self.in_node, self.out_node))
 
     def __str__(self) -> str:
 
@@ -0,0 +1,168 @@
+import os
+import pickle
+import traceback
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from time import perf_counter
+from typing import List, Dict, Tuple
+
+from Evaluator import Evaluator
+from GenePool import GenePool
+from Genome import Genome
+from Network import Network
+from Simulation import Simulation
+from processing_genes import build_network
+
+
+def worker_loop(connection: Connection, simulation: Simulation, input_size: int, output_size: int):
+    """
+    The loop of a worker process of a WorkerPool, which answers one request per generation until it gets an empty one
+    A request holds whether to forget every genome first, the depths of the nodes which are new to the worker,
+    the genomes to forget, the genes of the genomes which are new to the worker,
+    and the evaluation id and batch id of each genome to run
+    The networks of the genomes are kept between requests, so a genome which is run again is not rebuilt
+    :param connection: The worker end of the pipe to the pool
+    :param simulation: The simulation of the worker
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    """
+    gene_pool = GenePool(0, 0, {})
+    networks: Dict[int, Network] = {}
+    while True:
+        request = connection.recv_bytes()
+        if not request:
+            break
+        try:
+            reset, node_depths, evicted, new_genes, tasks = pickle.loads(request)
+            if reset:
+                networks.clear()
+            for node, depth in node_depths:
+                gene_pool.set_depth(node, depth)
+            for evaluation_id in evicted:
+                del networks[evaluation_id]
+            for evaluation_id, gene_arrays in new_genes:
+                networks[evaluation_id], middles = build_network(gene_arrays, input_size, output_size, gene_pool)
+            fitnesses = []
+            for evaluation_id, batch_id in tasks:
+                network = networks[evaluation_id]
+                network.batch_id = batch_id
+                simulation.restart()
+                fitnesses.append(network.execute(simulation))
+            connection.send_bytes(pickle.dumps((True, fitnesses)))
+        except Exception:
+            connection.send_bytes(pickle.dumps((False, traceback.format_exc())))
+    connection.close()
+
+
+class WorkerPool(Evaluator):
+    def __init__(self, simulation: Simulation, input_size: int, output_size: int, workers: int = None):
+        """
+        The WorkerPool is a set of worker processes which last for the whole run, keeping their simulation
+        and the networks of the genomes they ran warm from generation to generation
+        Each genome stays on the worker it was first sent to, only genomes which are new since the last generation
+        are sent, as gene arrays, genomes which are carried over, like champions, are sent as their evaluation id
+        Genomes which are not run in a generation are forgotten by the workers
+        If a worker fails, every worker forgets all its genomes, and they are all sent again the next generation
+        Like the ProcessEvaluator, every worker restarts its simulation before each genome,
+        and the simulation must be picklable
+        The time spent splitting and serializing the requests, the time spent waiting for the workers,
+        and the bytes sent are kept for the last generation in the stats
+        :param simulation: The simulation to copy into every worker
+        :param input_size: The number of input nodes of the genomes
+        :param output_size: The number of output nodes of the genomes
+        :param workers: The number of worker processes, None for one per core
+        """
+        self.workers: int = workers if workers is not None else os.cpu_count()
+        self.connections: List[Connection] = []
+        self.processes: List[Process] = []
+        for i in range(self.workers):
+            connection, worker_connection = Pipe()
+            process = Process(target=worker_loop, args=(worker_connection, simulation, input_size, output_size),
+                              daemon=True)
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        self.next_evaluation_id: int = 0
+        self.resident: List[Dict[int, Genome]] = [{} for i in range(self.workers)]
+        self.shipped_node: int = None
+        # Set when a worker failed, so every worker forgets its genomes with the next request
+        self.reset: bool = False
+        self.stats: Dict[str, float] = {}
+
+    def evaluate(self, genomes: List[Genome], batch_ids: List[int]) -> List[float]:
+        """
+        Runs the simulation for every genome, sending each worker one request
+        A genome a worker already has is run there, a new genome goes to the worker with the least genomes to run
+        :param genomes: The genomes to run
+        :param batch_ids: The batch id of each genome
+        :return: The fitness of each genome
+        """
+        start = perf_counter()
+        tasks: List[List[Tuple[int, int]]] = [[] for i in range(self.workers)]
+        new_genes: List[list] = [[] for i in range(self.workers)]
+        kept: List[Dict[int, Genome]] = [{} for i in range(self.workers)]
+        places: List[Tuple[int, int]] = []
+        carried = 0
+        for genome, batch_id in zip(genomes, batch_ids):
+            worker = next((i for i in range(self.workers)
+                           if self.resident[i].get(genome.evaluation_id) is genome), None)
+            if worker is None or genome.evaluation_id in kept[worker]:
+                worker = min(range(self.workers), key=lambda i: len(tasks[i]))
+                genome.evaluation_id = self.next_evaluation_id
+                self.next_evaluation_id += 1
+                new_genes[worker].append((genome.evaluation_id, genome.gene_arrays))
+            else:
+                carried += 1
+            kept[worker][genome.evaluation_id] = genome
+            places.append((worker, len(tasks[worker])))
+            tasks[worker].append((genome.evaluation_id, batch_id))
+
+        # Node numbers only grow, so the nodes the workers have not seen are the ones after the last sent node
+        node_depths = []
+        if len(genomes) > 0:
+            node_table = genomes[0].gene_pool.node_table
+            node_depths = [(node, depth) for node, depth in node_table.to_dict().items()
+                           if self.shipped_node is None or node >= self.shipped_node]
+            if node_depths:
+                self.shipped_node = max(node for node, depth in node_depths) + 1
+
+        sent_bytes = 0
+        for i in range(self.workers):
+            evicted = [evaluation_id for evaluation_id in self.resident[i] if evaluation_id not in kept[i]]
+            request = pickle.dumps((self.reset, node_depths, evicted, new_genes[i], tasks[i]))
+            sent_bytes += len(request)
+            self.connections[i].send_bytes(request)
+        schedule_time = perf_counter() - start
+
+        # Every reply is read, even after a failure, so no reply is left for the next generation
+        start = perf_counter()
+        replies = [pickle.loads(connection.recv_bytes()) for connection in self.connections]
+        wait_time = perf_counter() - start
+        failures = [result for success, result in replies if not success]
+        if failures:
+            # What a failed worker holds is not known, so every worker starts again from nothing
+            self.resident = [{} for i in range(self.workers)]
+            self.shipped_node = None
+            self.reset = True
+            raise RuntimeError("%d workers failed to run their genomes\n%s" % (len(failures), failures[0]))
+        self.resident = kept
+        self.reset = False
+        results = [result for success, result in replies]
+
+        self.stats = {"genomes": len(genomes), "sent": len(genomes) - carried, "carried": carried,
+                      "bytes": sent_bytes, "schedule_time": schedule_time, "wait_time": wait_time}
+        return [results[worker][task] for worker, task in places]
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        for connection in self.connections:
+            connection.send_bytes(b"")
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
@@ -0,0 +1,77 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from Conditions import Conditions
+from GeneArrays import GeneArrays
+
+
+def count_matrix(gene_arrays: List[GeneArrays], columns: np.array) -> Tuple[np.array, np.array]:
+    """
+    Counts how many times each innovation number appears in each genome
+    :param gene_arrays: The genes of each genome
+    :param columns: The sorted innovation numbers which make up the columns of the matrix
+    :return: A Tuple containing, a (genomes, columns) array of counts,
+        and the column of the last innovation number of each genome
+    """
+    lengths = np.array([len(genes) for genes in gene_arrays], dtype=np.int64)
+    rows = np.repeat(np.arange(len(gene_arrays)), lengths)
+    innovation_numbers = np.concatenate([genes.innovation_numbers for genes in gene_arrays])
+    indices = rows * len(columns) + columns.searchsorted(innovation_numbers)
+    counts = np.bincount(indices, minlength=len(gene_arrays) * len(columns)).reshape(len(gene_arrays), len(columns))
+    last_columns = columns.searchsorted(np.array([genes.innovation_numbers[-1] for genes in gene_arrays]))
+    return counts, last_columns
+
+
+def compatibility_matrix(representatives: List[GeneArrays], gene_arrays: List[GeneArrays], conditions: Conditions,
+                         chunk_size: int = 1024) -> np.array:
+    """
+    Finds the compatibility distance between every representative and every genome at once,
+    entry [i, j] is the same as Genome.compare with representative i as the current genome and genome j as the other
+    Genomes are compared in chunks, so the count matrices stay small for large populations
+    :param representatives: The genes of each representative
+    :param gene_arrays: The genes of each genome
+    :param conditions: The Conditions to compare under, includes weight, disjoint and excess coefficients
+    :param chunk_size: The number of genomes compared at once
+    :return: A (representatives, genomes) array of compatibility distances
+    """
+    distances = np.zeros((len(representatives), len(gene_arrays)))
+    if len(representatives) == 0 or len(gene_arrays) == 0:
+        return distances
+
+    representative_sizes = np.array([len(genes) for genes in representatives])
+    divisors = np.where(representative_sizes <= conditions.genome_min_divide, 1, representative_sizes)
+    disjoint_coefficients = (conditions.genome_disjoint_coefficient / divisors)[:, np.newaxis]
+    excess_coefficients = (conditions.genome_excess_coefficient / divisors)[:, np.newaxis]
+
+    for start in range(0, len(gene_arrays), chunk_size):
+        chunk = gene_arrays[start:start + chunk_size]
+        columns = np.unique(np.concatenate([genes.innovation_numbers for genes in representatives + chunk]))
+        representative_counts, representative_last = count_matrix(representatives, columns)
+        counts, last = count_matrix(chunk, columns)
+        sizes = counts.sum(axis=1)
+
+        # Matching genes are paired off one to one, so an innovation number matches the smaller of its two counts
+        # The smaller count is the number of k for which both counts are at least k
+        matching = np.zeros((len(representatives), len(chunk)))
+        for k in range(1, min(representative_counts.max(), counts.max()) + 1):
+            matching += (representative_counts >= k).astype(float) @ (counts >= k).astype(float).T
+
+        # Genes before the last gene of the other genome, counted through the cumulative counts
+        representative_before = np.cumsum(representative_counts, axis=1) - representative_counts
+        before = np.cumsum(counts, axis=1) - counts
+        representative_before_last = representative_before[:, last]
+        before_representative_last = before[:, representative_last].T
+
+        # All matching genes come at or before both last genes, so the matching genes before a last gene are
+        # the matching genes, less the ones at that last gene
+        matching_at_last = np.minimum(representative_counts[:, last], counts[np.arange(len(chunk)), last])
+        matching_at_representative_last = np.minimum(
+            representative_counts[np.arange(len(representatives)), representative_last][:, np.newaxis],
+            counts[:, representative_last].T)
+
+        disjoint = (representative_before_last - (matching - matching_at_last) +
+                    before_representative_last - (matching - matching_at_representative_last))
+        excess = representative_sizes[:, np.newaxis] + sizes[np.newaxis, :] - 2 * matching - disjoint
+        distances[:, start:start + len(chunk)] = disjoint * disjoint_coefficients + excess * excess_coefficients
+    return distances
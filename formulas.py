@@ -38,6 +38,25 @@ def rand(num: Union[int, float]) -> Union[float]:
 randomize = numpy.vectorize(rand)
 
 
+def sparse_dot(values: numpy.array, rows: numpy.array, columns: numpy.array, weights: numpy.array,
+               width: int) -> numpy.array:
+    """
+    Multiplies a matrix of values by a sparse matrix stored as a list of edges
+    :param values: A (samples, rows) matrix of values
+    :param rows: The row of every edge, an index into the columns of values
+    :param columns: The column of every edge
+    :param weights: The weight of every edge
+    :param width: The number of columns of the sparse matrix
+    :return: A (samples, width) matrix, the product of the values and the sparse matrix
+    """
+    samples = values.shape[0]
+    if samples == 1:
+        return numpy.bincount(columns, numpy.multiply(values[0, rows], weights), width)[None]
+    flat_columns = numpy.add(columns, numpy.multiply(width, numpy.arange(samples)[:, None])).ravel()
+    flat_weights = numpy.multiply(values[:, rows], weights).ravel()
+    return numpy.bincount(flat_columns, flat_weights, samples * width).reshape((samples, width))
+
+
 def color_formula(x: Union[int, float]) -> Tuple[int, int, int]:
     return 0, int(x * 255.), 0
 
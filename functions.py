@@ -1,23 +1,62 @@
 from typing import List, Tuple
 import re
 
+import numpy
+
+
+def divide_whole(whole: int, fractions: List[float]) -> List[int]:
+    """
+    Divides a whole number into integer parts, one for each fraction, by largest remainder
+    First the integer part of every fraction is handed out, largest fraction first, until the whole runs out,
+    then the rest is handed out one at a time to the largest remainders, the first fraction winning ties
+    When the fractions sum to the whole, the parts sum to the whole
+    Runs in a couple of sorts over the fractions, without recursion
+    :param whole: The number to divide
+    :param fractions: The share of the whole for each part, these are not changed
+    :return: The integer part for each fraction
+    """
+    fractions = numpy.asarray(fractions, dtype=float)
+    result = numpy.zeros(len(fractions), dtype=numpy.int64)
+    integer_parts = numpy.floor(fractions).astype(numpy.int64)
+    remainders = fractions - integer_parts
+
+    # Every fraction of at least one is larger than every remainder, so their integer parts come first
+    order = numpy.argsort(-fractions, kind='stable')
+    order = order[integer_parts[order] >= 1]
+    handed_out = numpy.cumsum(integer_parts[order])
+    taken = order[:numpy.searchsorted(handed_out, whole, 'left') + 1]
+    result[taken] = integer_parts[taken]
+    whole -= int(result.sum())
 
-def divide_whole(whole: int, fractions: List[float]):
-    top = max(fractions)
-    index = fractions.index(top)
-    if top >= 1.0:
-        chunk = int(top)
-        fractions[index] -= chunk
-    else:
-        chunk = 1
-        fractions[index] = 0
-    whole -= chunk
     if whole > 0:
-        result = divide_whole(whole, fractions)
+        order = numpy.argsort(-remainders, kind='stable')
+        order = order[remainders[order] > 0]
+        result[order[:whole]] += 1
+        # Once every remainder is used up, the rest goes to the first fraction
+        result[0] += max(0, whole - len(order))
+    return result.tolist()
+
+
+def select_top(values: numpy.array, count: int) -> numpy.array:
+    """
+    Selects the largest values without sorting all of them, the values are partitioned around the count-th largest
+    and only the selected values are sorted
+    The order is the same as a stable sort from largest to smallest, so equal values keep their order
+    :param values: The values to select from
+    :param count: The number of values to select, at most the number of values
+    :return: The indices of the selected values, largest first
+    """
+    values = numpy.asarray(values, dtype=float)
+    count = max(0, min(count, len(values)))
+    if count == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+    elif count < len(values):
+        threshold = numpy.partition(values, len(values) - count)[len(values) - count]
+        above = numpy.flatnonzero(values > threshold)
+        selected = numpy.concatenate([above, numpy.flatnonzero(values == threshold)[:count - len(above)]])
     else:
-        result = [0 for fraction in fractions]
-    result[index] += chunk
-    return result
+        selected = numpy.arange(len(values))
+    return selected[numpy.lexsort((selected, -values[selected]))]
 
 
 def surround_tag(tag, string):
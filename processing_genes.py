@@ -1,12 +1,37 @@
-from typing import Tuple, List
+from typing import Tuple, List, Union
 
 import numpy as np
 
 from Gene import Gene
+from GeneArrays import GeneArrays
 from GenePool import GenePool
+from Network import Network
 
 
-def process_genes(genes: List[Gene], input_size: int, output_size: int, gene_pool: GenePool) \
+def order_nodes(genes: GeneArrays, input_size: int, output_size: int, gene_pool: GenePool) \
+        -> Tuple[np.array, np.array, List[int]]:
+    """
+    Orders the nodes of the Genes by depth, the ordering is shared by the dense and sparse phenotypes
+    :param genes: The Genes to order the nodes of
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param gene_pool: The GenePool which has data on the depth of nodes, which creates the ordering
+    :return: A Tuple containing, the row of the in node of each gene, the column of the out node of each gene,
+        and the list of middle nodes
+    """
+    nodes = np.unique(np.concatenate([genes.in_nodes, genes.out_nodes,
+                                      np.arange(1, input_size + 1), np.arange(0, -output_size, -1)]))
+    node_indices = np.empty(len(nodes), dtype=np.int64)
+    node_indices[np.argsort(gene_pool.node_table.get_ranks(nodes))] = np.arange(len(nodes))
+
+    rows = node_indices[np.searchsorted(nodes, genes.in_nodes)]
+    columns = node_indices[np.searchsorted(nodes, genes.out_nodes)] - input_size
+    middles = np.unique(np.concatenate([genes.in_nodes[genes.in_nodes > input_size],
+                                        genes.out_nodes[genes.out_nodes > 0]]))
+    return rows, columns, middles.tolist()
+
+
+def process_genes(genes: Union[GeneArrays, List[Gene]], input_size: int, output_size: int, gene_pool: GenePool) \
         -> Tuple[np.array, np.array, int, List[int]]:
     """
     Processes Genes to produce a weight Adjacency matrix and an Enabled matrix,
@@ -18,43 +43,149 @@ def process_genes(genes: List[Gene], input_size: int, output_size: int, gene_poo
     :return: A Tuple containing, Weight Adjacency Matrix, Enabled Adjacency Matrix, Number of middle nodes,
         and the list of middle nodes
     """
-    # print("PROCESSING In:", '\n\t'.join([str(gene) for gene in genes]))
-    # print("PROCESSING In:", input_size, output_size)
-    nodes = set()
-    middles = set()
-    for connection_gene in genes:
-        nodes.add(connection_gene.in_node)
-        nodes.add(connection_gene.out_node)
-
-        if connection_gene.in_node > input_size:
-            middles.add(connection_gene.in_node)
-
-        if connection_gene.out_node > 0:
-            middles.add(connection_gene.out_node)
-
-    list(map(nodes.add, range(1, input_size + 1)))
-    list(map(nodes.add, range(0, -output_size, -1)))
-    # print("PROCESSING In:",
-    #       list(map(nodes.add, range(1, input_size + 1))),
-    #       list(map(nodes.add, range(0, -output_size, -1))))
-
-    nodes = list(nodes)
-    nodes_with_depth = list(map(lambda node: (gene_pool.get_depth(node), node), nodes))
-    nodes.sort()
-    nodes_with_depth.sort()
-    node_indices = {}
-    for i in range(len(nodes_with_depth)):
-        node_indices[nodes_with_depth[i][1]] = i
+    if not isinstance(genes, GeneArrays):
+        genes = GeneArrays.from_genes(genes)
+    rows, columns, middles = order_nodes(genes, input_size, output_size, gene_pool)
 
     middle_size = len(middles)
     enabled_matrix = np.zeros((input_size + middle_size, middle_size + output_size), dtype=bool)
     weight_matrix = np.zeros((input_size + middle_size, middle_size + output_size))
 
-    for gene in genes:
-        if gene.enabled:
-            start = node_indices[gene.in_node]
-            end = node_indices[gene.out_node] - input_size
-            enabled_matrix[start][end] = True
-            weight_matrix[start][end] = gene.weight
+    enabled_matrix[rows[genes.enabled], columns[genes.enabled]] = True
+    weight_matrix[rows[genes.enabled], columns[genes.enabled]] = genes.weights[genes.enabled]
     # print("PROCESSING OUT:", weight_matrix.shape, enabled_matrix.shape, middle_size, list(middles), middles)
-    return weight_matrix, enabled_matrix, middle_size, list(middles)
+    return weight_matrix, enabled_matrix, middle_size, middles
+
+
+def process_genes_sparse(genes: Union[GeneArrays, List[Gene]], input_size: int, output_size: int,
+                         gene_pool: GenePool) -> Tuple[Tuple[np.array, np.array, np.array], int, List[int]]:
+    """
+    Processes Genes to produce the weights as compressed sparse rows, in the same ordering as process_genes,
+    as well as the nodes that are not input or output nodes
+    No dense matrix is built, so the memory used grows with the number of genes instead of the number of nodes squared
+    When several enabled genes make the same connection, the last one is kept, as in process_genes
+    :param genes: The Genes to convert
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param gene_pool: The GenePool which has data on the depth of nodes, which creates the ordering
+    :return: A Tuple containing, the row pointers, column indices and weights of the compressed sparse rows,
+        Number of middle nodes, and the list of middle nodes
+    """
+    if not isinstance(genes, GeneArrays):
+        genes = GeneArrays.from_genes(genes)
+    rows, columns, middles = order_nodes(genes, input_size, output_size, gene_pool)
+
+    middle_size = len(middles)
+    rows, columns, weights = rows[genes.enabled], columns[genes.enabled], genes.weights[genes.enabled]
+    order = np.lexsort((columns, rows))
+    rows, columns, weights = rows[order], columns[order], weights[order]
+    last = np.append(np.logical_or(rows[1:] != rows[:-1], columns[1:] != columns[:-1]), True)
+    rows, columns, weights = rows[last], columns[last], weights[last]
+
+    row_pointers = np.searchsorted(rows, np.arange(input_size + middle_size + 1))
+    return (row_pointers, columns, weights), middle_size, middles
+
+
+def build_network(genes: Union[GeneArrays, List[Gene]], input_size: int, output_size: int, gene_pool: GenePool,
+                  sparse_density: float = 0.02, sparse_middle_size: int = 256) -> Tuple[Network, List[int]]:
+    """
+    Builds the Network for Genes, picking the sparse phenotype for large networks with few connections
+    :param genes: The Genes to convert
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param gene_pool: The GenePool which has data on the depth of nodes, which creates the ordering
+    :param sparse_density: The sparse phenotype is used when less than this fraction of the matrix is connected
+    :param sparse_middle_size: The sparse phenotype is only used with at least this many middle nodes
+    :return: A Tuple containing, the Network and the list of middle nodes
+    """
+    if not isinstance(genes, GeneArrays):
+        genes = GeneArrays.from_genes(genes)
+    middle_size = len(np.unique(np.concatenate([genes.in_nodes[genes.in_nodes > input_size],
+                                                genes.out_nodes[genes.out_nodes > 0]])))
+    matrix_size = (input_size + middle_size) * (middle_size + output_size)
+    enabled_size = np.count_nonzero(genes.enabled)
+
+    if middle_size >= sparse_middle_size and enabled_size < sparse_density * matrix_size:
+        sparse_weights, middle_size, middles = process_genes_sparse(genes, input_size, output_size, gene_pool)
+        network = Network(None, None, input_size, output_size, middle_size, sparse_weights=sparse_weights)
+    else:
+        weight_matrix, enabled_matrix, middle_size, middles = process_genes(genes, input_size, output_size, gene_pool)
+        network = Network(weight_matrix, enabled_matrix, input_size, output_size, middle_size)
+    return network, middles
+
+
+def compile_networks(gene_arrays: List[GeneArrays], input_size: int, output_size: int, gene_pool: GenePool,
+                     sparse_density: float = 0.02, sparse_middle_size: int = 256) -> List[Tuple[Network, List[int]]]:
+    """
+    Builds the Networks for many genomes at once, giving the same networks as calling build_network on each
+    The nodes of every genome are ordered with one sort over the whole population,
+    and every weight and enabled matrix is filled with one write into a shared buffer
+    Genomes which build_network would give the sparse phenotype are still built one at a time
+    :param gene_arrays: The genes of each genome
+    :param input_size: The number of input nodes
+    :param output_size: The number of output nodes
+    :param gene_pool: The GenePool which has data on the depth of nodes, which creates the ordering
+    :param sparse_density: The sparse phenotype is used when less than this fraction of the matrix is connected
+    :param sparse_middle_size: The sparse phenotype is only used with at least this many middle nodes
+    :return: A list containing, a Tuple of the Network and the list of middle nodes for each genome
+    """
+    if len(gene_arrays) == 0:
+        return []
+    genome_count = len(gene_arrays)
+    lengths = np.array([len(genes) for genes in gene_arrays], dtype=np.int64)
+    gene_genomes = np.repeat(np.arange(genome_count), lengths)
+    in_nodes = np.concatenate([genes.in_nodes for genes in gene_arrays])
+    out_nodes = np.concatenate([genes.out_nodes for genes in gene_arrays])
+    weights = np.concatenate([genes.weights for genes in gene_arrays])
+    enabled = np.concatenate([genes.enabled for genes in gene_arrays])
+
+    # Every genome has every input and output node, as well as the nodes of its genes
+    fixed_nodes = np.concatenate([np.arange(1, input_size + 1), np.arange(0, -output_size, -1)])
+    node_genomes = np.concatenate([gene_genomes, gene_genomes, np.repeat(np.arange(genome_count), len(fixed_nodes))])
+    nodes = np.concatenate([in_nodes, out_nodes, np.tile(fixed_nodes, genome_count)])
+
+    # Sorting by genome then global rank puts the nodes of each genome in depth order,
+    # so the index of a node in its genome is its place in the sort less the start of its genome
+    ranks = gene_pool.node_table.get_ranks(nodes)
+    rank_count = int(ranks.max()) + 1
+    keys, key_indices = np.unique(node_genomes * rank_count + ranks, return_inverse=True)
+    key_genomes = keys // rank_count
+    genome_starts = np.searchsorted(key_genomes, np.arange(genome_count + 1))
+    node_indices = key_indices - genome_starts[node_genomes]
+    middle_sizes = np.diff(genome_starts) - input_size - output_size
+
+    rows = node_indices[:len(in_nodes)]
+    columns = node_indices[len(in_nodes):2 * len(in_nodes)] - input_size
+    row_counts = input_size + middle_sizes
+    column_counts = middle_sizes + output_size
+    offsets = np.concatenate([[0], np.cumsum(row_counts * column_counts)])
+
+    sparse = np.logical_and(middle_sizes >= sparse_middle_size,
+                            np.bincount(gene_genomes, weights=enabled, minlength=genome_count) <
+                            sparse_density * row_counts * column_counts)
+    weight_buffer = np.zeros(offsets[-1])
+    enabled_buffer = np.zeros(offsets[-1], dtype=bool)
+    written = np.logical_and(enabled, ~sparse[gene_genomes])
+    flat_indices = (offsets[gene_genomes] + rows * column_counts[gene_genomes] + columns)[written]
+    weight_buffer[flat_indices] = weights[written]
+    enabled_buffer[flat_indices] = True
+
+    node_count = int(nodes.max()) + 1
+    middle_nodes = np.unique(np.concatenate([gene_genomes[in_nodes > input_size] * node_count +
+                                             in_nodes[in_nodes > input_size],
+                                             gene_genomes[out_nodes > 0] * node_count + out_nodes[out_nodes > 0]]))
+    middle_starts = np.searchsorted(middle_nodes // node_count, np.arange(genome_count + 1))
+    middle_nodes = middle_nodes % node_count
+
+    networks = []
+    for i in range(genome_count):
+        if sparse[i]:
+            networks.append(build_network(gene_arrays[i], input_size, output_size, gene_pool,
+                                          sparse_density, sparse_middle_size))
+            continue
+        shape = (row_counts[i], column_counts[i])
+        weight_matrix = weight_buffer[offsets[i]:offsets[i + 1]].reshape(shape)
+        enabled_matrix = enabled_buffer[offsets[i]:offsets[i + 1]].reshape(shape)
+        networks.append((Network(weight_matrix, enabled_matrix, input_size, output_size, int(middle_sizes[i])),
+                         middle_nodes[middle_starts[i]:middle_starts[i + 1]].tolist()))
+    return networks